@@ -0,0 +1,234 @@
+import discord
+from typing import List, NamedTuple, Optional, Tuple
+import collections
+import hashlib
+import json
+import re
+import time
+
+
+class AnalysisResult(NamedTuple):
+    """Validated LLM verdict: first off-topic message ID (None = all fine) and a reason."""
+
+    first_offtopic_id: Optional[str]
+    reason: str
+
+
+# response_format for endpoints that support structured outputs
+ANALYSIS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "offtopic_analysis",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "first_offtopic_id": {"type": ["string", "null"]},
+                "reason": {"type": "string"},
+            },
+            "required": ["first_offtopic_id", "reason"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+_ID_RE = re.compile(r'"first_offtopic_id"\s*:\s*(?:(null)|"(\w*)"|(\d+)[\s,}])')
+_REASON_RE = re.compile(r'"reason"\s*:\s*"((?:[^"\\]|\\.)*)', re.DOTALL)
+
+
+def _normalise_id(value) -> Optional[str]:
+    if value is None or str(value).strip().lower() in ("", "null", "none"):
+        return None
+    value = str(value).strip()
+    if not value.isdigit():
+        raise ValueError(f"first_offtopic_id is not a message ID: {value!r}")
+    return value
+
+
+def result_from_obj(obj) -> AnalysisResult:
+    """Validate a decoded JSON object."""
+    if not isinstance(obj, dict) or "first_offtopic_id" not in obj:
+        raise ValueError("response has no first_offtopic_id")
+    reason = obj.get("reason") or ""
+    return AnalysisResult(_normalise_id(obj["first_offtopic_id"]), reason if isinstance(reason, str) else str(reason))
+
+
+def parse_result(text: str) -> AnalysisResult:
+    """Parse a model answer, tolerating markdown fences, surrounding prose and truncation."""
+    content = text.strip()
+    if "```json" in content:
+        content = content.split("```json")[1].split("```")[0].strip()
+    elif "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+
+    candidates = [content]
+    start, end = content.find("{"), content.rfind("}")
+    if 0 <= start < end:
+        candidates.append(content[start:end + 1])
+    for candidate in candidates:
+        try:
+            return result_from_obj(json.loads(candidate))
+        except json.JSONDecodeError:
+            continue
+
+    # Salvage what we can from broken or cut-off JSON (e.g. max_tokens hit inside the reason)
+    match = _ID_RE.search(content + " ")
+    if not match:
+        raise ValueError("no first_offtopic_id in response")
+    first_id = _normalise_id(match.group(2) or match.group(3))
+    reason = ""
+    reason_match = _REASON_RE.search(content)
+    if reason_match:
+        raw = reason_match.group(1).rstrip("\\")
+        try:
+            reason = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            reason = raw
+    return AnalysisResult(first_id, reason)
+
+
+class StreamingResultParser:
+    """Incrementally consumes a streamed answer and exposes the ID as soon as it is complete."""
+
+    def __init__(self):
+        self._buffer = ""
+        self.id_ready = False
+        self.first_offtopic_id: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, delta: str) -> bool:
+        """Add streamed text. Returns True exactly once, when the ID became available."""
+        self._buffer += delta
+        if self.id_ready:
+            return False
+        match = _ID_RE.search(self._buffer)
+        if not match:
+            return False
+        try:
+            self.first_offtopic_id = _normalise_id(match.group(2) or match.group(3))
+        except ValueError:
+            return False
+        self.id_ready = True
+        return True
+
+    def result(self) -> AnalysisResult:
+        return parse_result(self._buffer)
+
+
+def window_fingerprint(
+    model: str, variant: str, server_prompt: str, messages: List[discord.Message]
+) -> str:
+    """Hash everything that influences the LLM answer for a message window."""
+    digest = hashlib.sha256()
+    for part in (model, variant, server_prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    for msg in messages:
+        edited = msg.edited_at.timestamp() if msg.edited_at else 0
+        digest.update(f"{msg.id}:{edited}\n".encode("ascii"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Short-lived, size-bounded cache of analysis results keyed by window fingerprint."""
+
+    def __init__(self, ttl: float = 300, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, Tuple[float, AnalysisResult]]" = collections.OrderedDict()
+
+    def get(self, key: str) -> Optional[AnalysisResult]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, result = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: AnalysisResult):
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+OMISSION_TOKENS = 20  # reserved for each "[... ausgelassen ...]" line
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count; chat text, German words and snowflake IDs average about 3 chars per token."""
+    return (len(text) + 2) // 3 + 1
+
+
+def format_message_line(msg: discord.Message, marker: str = "") -> str:
+    """Single prompt line for a message, content flattened and capped at 200 chars."""
+    content = msg.content.replace('\n', ' ')[:200]
+    return f"ID: {msg.id} | Author: {msg.author.display_name} | Content: {content}{marker}"
+
+
+def _omission_line(skipped: List[discord.Message]) -> str:
+    authors = list(dict.fromkeys(msg.author.display_name for msg in skipped))
+    names = ", ".join(authors[:5]) + (" u.a." if len(authors) > 5 else "")
+    return f"[... {len(skipped)} Nachricht(en) von {names} ausgelassen ...]"
+
+
+def build_message_block(
+    messages: List[discord.Message], user_suggested_id: Optional[str], budget: int, marker: str
+) -> Tuple[str, int]:
+    """Fit a chronological window into a token budget.
+
+    The user-suggested message is always kept. Remaining budget goes to the newest messages, so
+    the oldest context is dropped first; dropped stretches are replaced by a one-line summary.
+    Returns the prompt block and the number of dropped messages.
+    """
+    lines = []
+    suggested_index = None
+    for index, msg in enumerate(messages):
+        is_suggested = user_suggested_id is not None and str(msg.id) == user_suggested_id
+        if is_suggested:
+            suggested_index = index
+        lines.append(format_message_line(msg, marker if is_suggested else ""))
+
+    costs = [estimate_tokens(line) for line in lines]
+    if sum(costs) <= budget:
+        return "\n".join(lines), 0
+
+    keep = [False] * len(lines)
+    remaining = budget - 2 * OMISSION_TOKENS
+    if suggested_index is not None:
+        keep[suggested_index] = True
+        remaining -= costs[suggested_index]
+    for index in range(len(lines) - 1, -1, -1):
+        if keep[index]:
+            continue
+        if costs[index] > remaining:
+            break
+        keep[index] = True
+        remaining -= costs[index]
+
+    block = []
+    skipped: List[discord.Message] = []
+    for index, line in enumerate(lines):
+        if not keep[index]:
+            skipped.append(messages[index])
+            continue
+        if skipped:
+            block.append(_omission_line(skipped))
+            skipped = []
+        block.append(line)
+    if skipped:
+        block.append(_omission_line(skipped))
+
+    return "\n".join(block), keep.count(False)
@@ -0,0 +1,566 @@
+"""Offline replay and benchmark harness for the OffTopic cog.
+
+Runs ``_run_offtopic_analysis`` end to end (detection, voting, transfer) against in-memory
+fakes of the Discord objects it touches and a local OpenAI-compatible stub server, and reports
+latency, REST calls and memory per analysis. No Discord connection or API key is needed::
+
+    python -m offtopic.harness                       # built-in sample chat
+    python -m offtopic.harness chat.jsonl --runs 20 --llm-latency 0.8 --vote reject
+
+A chat log is JSON lines, oldest first::
+
+    {"author": "alice", "content": "sonarr findet nix", "offtopic": false}
+
+``offtopic`` marks the messages the stub LLM should flag; it answers with the first marked
+message ID present in the prompt, or null.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import discord
+from aiohttp import web
+
+from .stats import percentile
+
+
+_snowflakes = itertools.count(int((time.time() * 1000 - 1420070400000)) << 22)
+
+
+def _snowflake() -> int:
+    return next(_snowflakes)
+
+
+# ==================== FAKE DISCORD ====================
+
+
+class RestCounter(collections.Counter):
+    """Counts the Discord REST calls the fakes would have made."""
+
+
+class FakeAsset:
+    def __init__(self, url: str):
+        self.url = url
+
+
+class FakePermissions:
+    def __getattr__(self, name):
+        return True
+
+
+class FakeUser:
+    def __init__(self, name: str, bot: bool = False, admin: bool = False):
+        self.id = _snowflake()
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+        self.display_avatar = FakeAsset(f"https://cdn.example/avatars/{self.id}.png")
+        self.roles: list = []
+        self.joined_at = datetime.now(timezone.utc) - timedelta(days=365)
+        self.guild_permissions = discord.Permissions.all() if admin else discord.Permissions.none()
+
+    def __str__(self):
+        return self.name
+
+
+class FakeReaction:
+    def __init__(self, emoji: str):
+        self.emoji = emoji
+        self.count = 0
+        self.voters: List[FakeUser] = []
+
+    async def users(self):
+        for user in self.voters:
+            yield user
+
+
+class FakeReactionEvent:
+    """Stand-in for ``discord.RawReactionActionEvent``."""
+
+    def __init__(self, message: "FakeMessage", emoji: str, user: FakeUser):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id
+        self.user_id = user.id
+        self.member = user
+        self.emoji = discord.PartialEmoji(name=emoji)
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeTextChannel", author: FakeUser, content: str, created_at: datetime):
+        self.id = _snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.created_at = created_at
+        self.edited_at = None
+        self.attachments: list = []
+        self.embeds: list = []
+        self.stickers: list = []
+        self.reactions: List[FakeReaction] = []
+        self.jump_url = f"https://discord.com/channels/{channel.guild.id}/{channel.id}/{self.id}"
+
+    async def edit(self, content: str = None, **kwargs):
+        self.channel.rest["message.edit"] += 1
+        if content is not None:
+            self.content = content
+        return self
+
+    async def delete(self):
+        self.channel.rest["message.delete"] += 1
+        self.channel.remove(self)
+
+    async def add_reaction(self, emoji: str):
+        self.channel.rest["message.add_reaction"] += 1
+        self.react(emoji, self.channel.guild.me)
+        hook = self.channel.guild.on_bot_reaction
+        if hook:
+            hook(self, emoji)
+
+    def react(self, emoji: str, user: FakeUser):
+        reaction = next((r for r in self.reactions if r.emoji == emoji), None)
+        if reaction is None:
+            reaction = FakeReaction(emoji)
+            self.reactions.append(reaction)
+        reaction.count += 1
+        reaction.voters.append(user)
+        hook = self.guild.on_reaction
+        if hook:
+            hook(FakeReactionEvent(self, emoji, user))
+
+
+class FakeWebhook:
+    def __init__(self, channel: "FakeTextChannel", user: FakeUser, name: str):
+        self.id = _snowflake()
+        self.channel = channel
+        self.user = user
+        self.name = name
+        self.token = "token"
+
+    async def send(self, content: str = "", *, username: str, wait: bool = False, **kwargs):
+        self.channel.rest["webhook.execute"] += 1
+        author = FakeUser(username, bot=True)
+        return self.channel.post(author, content)
+
+
+class FakeTextChannel:
+    def __init__(self, guild: "FakeGuild", name: str):
+        self.id = _snowflake()
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{self.id}>"
+        self.rest = guild.rest
+        self.messages: List[FakeMessage] = []
+        self._webhooks: List[FakeWebhook] = []
+
+    def post(self, author: FakeUser, content: str, created_at: Optional[datetime] = None) -> FakeMessage:
+        msg = FakeMessage(self, author, content, created_at or datetime.now(timezone.utc))
+        self.messages.append(msg)
+        return msg
+
+    def remove(self, msg: FakeMessage):
+        if msg in self.messages:
+            self.messages.remove(msg)
+
+    def permissions_for(self, member) -> FakePermissions:
+        return FakePermissions()
+
+    async def send(self, content: str = None, **kwargs) -> FakeMessage:
+        self.rest["channel.send"] += 1
+        return self.post(self.guild.me, content or "")
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        self.rest["channel.fetch_message"] += 1
+        for msg in self.messages:
+            if msg.id == message_id:
+                return msg
+        raise discord.NotFound(_FakeResponse(404), "Unknown Message")
+
+    async def history(self, limit: Optional[int] = 100, before=None, after=None, oldest_first: Optional[bool] = None):
+        if oldest_first is None:
+            oldest_first = after is not None
+        selected = [
+            m for m in self.messages
+            if (before is None or m.id < before.id) and (after is None or m.id > after.id)
+        ]
+        if not oldest_first:
+            selected.reverse()
+        if limit is not None:
+            selected = selected[:limit]
+        # Discord pages history in requests of 100 messages
+        self.rest["channel.history"] += max(1, -(-len(selected) // 100))
+        for msg in selected:
+            yield msg
+
+    async def webhooks(self) -> List[FakeWebhook]:
+        self.rest["channel.webhooks"] += 1
+        return list(self._webhooks)
+
+    async def create_webhook(self, *, name: str, reason: str = None) -> FakeWebhook:
+        self.rest["channel.create_webhook"] += 1
+        webhook = FakeWebhook(self, self.guild.me, name)
+        self._webhooks.append(webhook)
+        return webhook
+
+    async def delete_messages(self, messages, *, reason: str = None):
+        self.rest["channel.delete_messages"] += 1
+        for msg in list(messages):
+            self.remove(msg)
+
+
+class FakeGuild:
+    def __init__(self, bot_user: FakeUser):
+        self.id = _snowflake()
+        self.name = "Harness"
+        self.rest = RestCounter()
+        self.me = bot_user
+        self.filesize_limit = 25 * 1024 * 1024
+        self.emojis: list = []
+        self.channels: List[FakeTextChannel] = []
+        self.members: Dict[int, FakeUser] = {}
+        self.on_bot_reaction = None
+        self.on_reaction = None  # gateway reaction events
+
+    @property
+    def text_channels(self) -> List[FakeTextChannel]:
+        return self.channels
+
+    def add_channel(self, name: str) -> FakeTextChannel:
+        channel = FakeTextChannel(self, name)
+        self.channels.append(channel)
+        return channel
+
+    def get_channel(self, channel_id: int) -> Optional[FakeTextChannel]:
+        return next((c for c in self.channels if c.id == channel_id), None)
+
+    def get_member(self, user_id: int) -> Optional[FakeUser]:
+        return self.members.get(user_id)
+
+    def get_role(self, role_id: int):
+        return None
+
+
+class _FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Not Found"
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def defer(self, **kwargs):
+        self.interaction.rest["interaction.defer"] += 1
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content: str = None, *, ephemeral: bool = False, wait: bool = False, **kwargs):
+        self.interaction.rest["interaction.followup"] += 1
+        msg = self.interaction.channel.post(self.interaction.guild.me, content or "")
+        self.interaction.responses.append((time.perf_counter(), content, ephemeral))
+        return msg
+
+
+class FakeInteraction:
+    def __init__(self, bot: "FakeBot", channel: FakeTextChannel, user: FakeUser):
+        self.client = bot
+        self.guild = channel.guild
+        self.channel = channel
+        self.user = user
+        self.rest = channel.rest
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+        self.responses: list = []
+
+    async def edit_original_response(self, **kwargs):
+        self.rest["interaction.edit_original"] += 1
+
+    async def delete_original_response(self):
+        self.rest["interaction.delete_original"] += 1
+
+
+class FakeBot:
+    """The parts of Red the cog touches during an analysis."""
+
+    def __init__(self, api_tokens: Dict[str, str]):
+        self.user = FakeUser("OffTopicBot", bot=True)
+        self._api_tokens = api_tokens
+        self.cogs: dict = {}
+        self.guilds: Dict[int, "FakeGuild"] = {}
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+    async def get_shared_api_tokens(self, service_name: str) -> Dict[str, str]:
+        return dict(self._api_tokens)
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+    async def cog_disabled_in_guild(self, cog, guild) -> bool:
+        return False
+
+
+# ==================== STUB LLM SERVER ====================
+
+
+class StubLLMServer:
+    """Local OpenAI-compatible /v1/chat/completions endpoint with streaming and usage."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.offtopic_ids: set = set()
+        self.calls = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._completions)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def _answer(self, prompt: str) -> str:
+        for message_id in re.findall(r"^ID: (\d+)", prompt, re.MULTILINE):
+            if int(message_id) in self.offtopic_ids:
+                return json.dumps({"first_offtopic_id": message_id, "reason": "Stub: markiert als Off-Topic"})
+        return json.dumps({"first_offtopic_id": None, "reason": "Alles on-topic"})
+
+    async def _completions(self, request: web.Request) -> web.StreamResponse:
+        self.calls += 1
+        body = await request.json()
+        prompt = "\n".join(m["content"] for m in body["messages"])
+        answer = self._answer(prompt)
+        usage = {"prompt_tokens": len(prompt) // 3, "completion_tokens": len(answer) // 3,
+                 "total_tokens": (len(prompt) + len(answer)) // 3}
+        await asyncio.sleep(self.latency)
+
+        def chunk(delta: dict, finish: Optional[str] = None) -> dict:
+            return {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": body["model"], "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        events = [chunk({"role": "assistant", "content": ""})]
+        events += [chunk({"content": answer[i:i + 16]}) for i in range(0, len(answer), 16)]
+        events.append(chunk({}, "stop"))
+        if body.get("stream_options", {}).get("include_usage"):
+            events.append({"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": body["model"], "choices": [], "usage": usage})
+        for event in events:
+            await response.write(f"data: {json.dumps(event)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+# ==================== REPLAY ====================
+
+
+SAMPLE_LOG = (
+    [{"author": a, "content": c, "offtopic": False} for a, c in [
+        ("alice", "Sonarr findet seit gestern keine Releases mehr über den Indexer"),
+        ("bob", "Hast du den API Key vom Indexer in Sonarr neu eingetragen?"),
+        ("alice", "Ja, Test im Indexer-Tab ist grün, aber die RSS Sync bleibt leer"),
+        ("carol", "Bei mir das gleiche mit Radarr, liegt vermutlich am Indexer selbst"),
+        ("bob", "Check mal die Logs von Sonarr, da steht meistens ein HTTP Fehler"),
+        ("alice", "Da steht 429 Too Many Requests beim RSS Sync"),
+        ("carol", "Dann das RSS Sync Intervall in Sonarr hochsetzen, 15 Minuten reicht"),
+        ("alice", "Ok, hab es auf 30 Minuten gestellt, mal schauen"),
+    ]]
+    + [{"author": a, "content": c, "offtopic": True} for a, c in [
+        ("dave", "Wer hat gestern das Bayern Spiel gesehen? Was für ein Elfmeter"),
+        ("erin", "Der Schiri war komplett blind, das war niemals ein Foul"),
+        ("dave", "Du hast doch keine Ahnung von Fußball"),
+        ("erin", "Sagt der, der letzte Woche Abseits nicht erklären konnte"),
+        ("frank", "Ihr streitet euch jede Woche über das gleiche Spiel"),
+        ("dave", "Halt dich da raus frank"),
+        ("erin", "Nächste Saison steigt ihr eh ab"),
+        ("dave", "Träum weiter, ihr seid doch seit Jahren Mittelmaß"),
+    ]]
+)
+
+
+def load_log(path: Optional[str]) -> List[dict]:
+    if not path:
+        return SAMPLE_LOG
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Harness:
+    """Wires an OffTopic cog to fakes and the stub LLM, and replays chat logs through it."""
+
+    def __init__(self, llm_latency: float = 0.0, vote: str = "approve", voters: int = 5):
+        self.stub = StubLLMServer(llm_latency)
+        self.vote = vote
+        self.voters = voters
+        self.bot = FakeBot({"openai_api_key": "harness"})
+        self.cog = None
+        self._events: set = set()
+        self._tmp = tempfile.TemporaryDirectory(prefix="offtopic-harness-")
+
+    async def setup(self):
+        from redbot.core import data_manager
+        from .offtopic import OffTopic
+
+        # Point Red's config at a throwaway JSON store, as redbot.pytest does
+        data_manager.basic_config = dict(data_manager.basic_config_default)
+        data_manager.basic_config["DATA_PATH"] = self._tmp.name
+
+        await self.stub.start()
+        self.cog = OffTopic(self.bot)
+        self.bot.cogs["OffTopic"] = self.cog
+        await self.cog.config.openai_base_url.set(self.stub.base_url)
+        await self.cog.config.openai_model.set("stub-model")
+        await self.cog.config.structured_output.set(False)
+
+    async def teardown(self):
+        await self.cog.cog_unload()
+        await self.stub.stop()
+        self._tmp.cleanup()
+
+    def _build_guild(self, log: List[dict]):
+        guild = FakeGuild(self.bot.user)
+        self.bot.guilds[guild.id] = guild
+        source = guild.add_channel("general")
+        destination = guild.add_channel("off-topic")
+        authors: Dict[str, FakeUser] = {}
+        start = datetime.now(timezone.utc) - timedelta(minutes=len(log))
+        self.stub.offtopic_ids = set()
+        for index, record in enumerate(log):
+            author = authors.setdefault(record["author"], FakeUser(record["author"]))
+            msg = source.post(author, record["content"], start + timedelta(minutes=index))
+            if record.get("offtopic"):
+                self.stub.offtopic_ids.add(msg.id)
+        invoker = FakeUser("invoker")
+        guild.members[invoker.id] = invoker
+
+        # Scripted voters react as soon as the bot has added its vote reactions
+        emoji = {"approve": "\N{THUMBS UP SIGN}", "reject": "\N{THUMBS DOWN SIGN}"}.get(self.vote)
+
+        def on_bot_reaction(message: FakeMessage, added: str):
+            if emoji and added == emoji:
+                for n in range(self.voters):
+                    message.react(emoji, FakeUser(f"voter{n}"))
+
+        guild.on_bot_reaction = on_bot_reaction
+        guild.on_reaction = self._dispatch_reaction
+        return guild, source, destination, invoker
+
+    def _dispatch_reaction(self, payload: FakeReactionEvent):
+        """Deliver a reaction event to the cog's listener, as the gateway would."""
+        task = asyncio.create_task(self.cog.on_raw_reaction_add(payload))
+        self._events.add(task)
+        task.add_done_callback(self._events.discard)
+
+    async def run_once(self, log: List[dict]) -> dict:
+        guild, source, destination, invoker = self._build_guild(log)
+        await self.cog.config.guild(guild).offtopic_channel_id.set(destination.id)
+        if self.vote == "timeout":
+            await self.cog.config.guild(guild).vote_timeout.set(1)
+        self.cog._invalidate_settings(guild.id)
+        self.cog._guild_usage.clear()
+        self.cog._user_usage.clear()
+        self.cog._user_blocked.clear()
+
+        interaction = FakeInteraction(self.bot, source, invoker)
+        llm_calls = self.stub.calls
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+
+        await interaction.response.defer()
+        await self.cog._run_offtopic_analysis(interaction)
+
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        first_response = interaction.responses[0][0] - started if interaction.responses else None
+        return {
+            "total": total,
+            "detection": first_response,
+            "llm_calls": self.stub.calls - llm_calls,
+            "rest": dict(guild.rest),
+            "rest_total": sum(guild.rest.values()),
+            "memory_peak": peak - baseline,
+            "moved": sum(1 for m in destination.messages if m.author.bot and m.author is not guild.me),
+            "left": len([m for m in source.messages if not m.author.bot]),
+        }
+
+
+def _report(results: List[dict]):
+    def fmt(values: List[float], scale: float = 1000, unit: str = "ms") -> str:
+        return (f"p50 {percentile(values, 50) * scale:.0f}{unit}  p90 {percentile(values, 90) * scale:.0f}{unit}"
+                f"  max {max(values) * scale:.0f}{unit}")
+
+    print(f"runs: {len(results)}")
+    print(f"end-to-end:  {fmt([r['total'] for r in results])}")
+    detection = [r["detection"] for r in results if r["detection"] is not None]
+    if detection:
+        print(f"to summary:  {fmt(detection)}")
+    print(f"memory peak: {fmt([r['memory_peak'] for r in results], 1 / 1024, ' KiB')}")
+    print(f"LLM calls:   {statistics.mean(r['llm_calls'] for r in results):.1f} per run")
+    print(f"REST calls:  {statistics.mean(r['rest_total'] for r in results):.1f} per run")
+    rest = collections.Counter()
+    for r in results:
+        rest.update(r["rest"])
+    for name, count in sorted(rest.items()):
+        print(f"  {name:28} {count / len(results):.1f}")
+    print(f"moved/left:  {results[-1]['moved']} webhook messages / {results[-1]['left']} user messages left")
+
+
+async def _main(args):
+    harness = Harness(args.llm_latency, args.vote, args.voters)
+    await harness.setup()
+    tracemalloc.start()
+    try:
+        log = load_log(args.log)
+        results = [await harness.run_once(log) for _ in range(args.runs)]
+    finally:
+        tracemalloc.stop()
+        await harness.teardown()
+    _report(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay chat logs through the OffTopic cog offline.")
+    parser.add_argument("log", nargs="?", help="JSON lines chat log (default: built-in sample)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the stub LLM waits before answering")
+    parser.add_argument("--vote", choices=["approve", "reject", "timeout"], default="approve")
+    parser.add_argument("--voters", type=int, default=5)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,29 @@
 import discord
 from redbot.core import Config, checks, commands, app_commands
 from redbot.core.bot import Red
-from openai import AsyncOpenAI
+from openai import BadRequestError
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Tuple, List, Dict
+from typing import Awaitable, Callable, Optional, Tuple, List, Dict
 import asyncio
-import json
 import logging
 import re
+import time
+
+from .analysis import (
+    ANALYSIS_RESPONSE_FORMAT,
+    AnalysisCache,
+    AnalysisResult,
+    StreamingResultParser,
+    build_message_block,
+    window_fingerprint,
+)
+from .prefilter import DriftTracker, TopicModel, assess_window
+from .providers import Provider, ProviderPool
+from .routing import ROUTING_RESPONSE_FORMAT, ChannelProfile, ChannelRouter, RouteSegment, parse_routes, segment_window
+from .scheduler import FairScheduler, PositionCallback
+from .stats import add_entry, make_entry, summarize
+from .transfer import ProgressReporter, WebhookTransfer
+from .votes import THUMBS_DOWN, THUMBS_UP, PendingVote
 
 
 # Modal for context menu confirmation
@@ -86,6 +102,10 @@ class OffTopic(commands.Cog):
         default_global = {
             "openai_model": "gpt-4.1",
             "openai_base_url": "https://api.openai.com/v1",
+            "prompt_token_budget": 3000,
+            "structured_output": True,
+            "providers": [],
+            "hedge_requests": False,
         }
 
         default_guild = {
@@ -93,12 +113,52 @@ class OffTopic(commands.Cog):
             "allowed_role_ids": [],
             "vote_timeout": 300,
             "vote_threshold": 5,
+            "prefilter_enabled": True,
+            "topic_model": {},
+            "watch_channel_ids": [],
+            "watch_threshold": 0.6,
+            "usage": {},
+            "pending_votes": {},
+            # Custom emoji names that let an admin force a vote result
+            "override_approve_emojis": ["SadgeBusiness", "Okay", "subi", "grrr", "HYPERS", "YEP", "dies"],
+            "override_reject_emojis": ["unsure", "BRUH"],
             "server_prompt": "This Discord server is about usenet, warez, torrents, automation (Sonarr/Radarr/SABnzbd), indexers, and general IT/piracy topics. Detect when conversations completely derail into unrelated arguments, personal fights, extended off-topic jokes, or random nonsense that has nothing to do with the server's purpose.",
         }
 
         self.config.register_global(**default_global)
         self.config.register_guild(**default_guild)
-        self._client: Optional[AsyncOpenAI] = None
+        self._provider_pool = ProviderPool(self.log)
+        self._providers_loaded = False
+        self._transfer = WebhookTransfer(bot, self.log)
+        self._analysis_cache = AnalysisCache()
+        self._topic_models: Dict[int, TopicModel] = {}
+        self._structured_unsupported: set = set()  # base URLs that rejected response_format
+
+        # Concurrency caps (global, per guild) for LLM calls and transfers
+        self._llm_scheduler = FairScheduler("llm", global_limit=4, guild_limit=2, log=self.log)
+        self._transfer_scheduler = FairScheduler("transfer", global_limit=2, guild_limit=1, log=self.log)
+
+        # Usage accounting
+        self._usage_lock = asyncio.Lock()
+        self._background_tasks: set = set()  # analyses and vote restores, cancelled on unload
+        self._usage_writes: set = set()  # config writes, always allowed to finish
+
+        # Background auto-detection state per watched channel
+        self._drift: Dict[int, DriftTracker] = {}
+        self._auto_running: set = set()
+        self._auto_cooldown: Dict[int, float] = {}
+
+        # Channel profiles for /wohin, per guild
+        self._routers: Dict[int, ChannelRouter] = {}
+
+        # Running votes by summary message ID, fed by reaction events
+        self._votes: Dict[int, PendingVote] = {}
+        self._override_emojis: Dict[int, Tuple[frozenset, frozenset]] = {}  # guild -> (approve, reject)
+        self._admin_cache: Dict[int, Dict[int, bool]] = {}  # guild -> member -> is admin
+
+        # In-memory config snapshots, invalidated by the setters below
+        self._guild_settings: Dict[int, dict] = {}
+        self._global_settings: Optional[dict] = None
 
         # Rate limiting
         self._guild_usage: Dict[int, List[datetime]] = {}
@@ -107,26 +167,100 @@ class OffTopic(commands.Cog):
 
     async def cog_load(self):
         """Called when the cog is loaded."""
-        pass
+        task = asyncio.create_task(self._restore_votes())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
     async def cog_unload(self):
         """Cleanup when cog is unloaded."""
-        self._client = None
-
-    async def _get_openai_client(self) -> Optional[AsyncOpenAI]:
-        """Get or create OpenAI client."""
-        if self._client is None:
-            api_keys = await self.bot.get_shared_api_tokens("offtopic")
-            api_key = api_keys.get("openai_api_key")
-            if not api_key:
-                return None
-            base_url = await self.config.openai_base_url()
-            self._client = AsyncOpenAI(api_key=api_key, base_url=base_url)
-        return self._client
+        # Running votes stay persisted and are picked up again by the next load
+        for vote in list(self._votes.values()):
+            vote.cancel()
+        # Stop automatic analyses and whatever else is still running in the background
+        tasks = [task for task in self._background_tasks if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Usage entries (including any logged by the tasks above while stopping) are still written
+        await asyncio.gather(*self._usage_writes, return_exceptions=True)
+        self._reset_client()
+        self._transfer.clear()
+        self._analysis_cache.clear()
+        self._routers.clear()
+        self._invalidate_settings()
+
+    # Guild data that is written directly through config and read from there, never snapshotted
+    UNCACHED_GUILD_KEYS = ("topic_model", "usage", "pending_votes")
+
+    async def _get_guild_settings(self, guild: discord.Guild) -> dict:
+        """Snapshot of the guild settings, loaded once and kept until a setter invalidates it."""
+        settings = self._guild_settings.get(guild.id)
+        if settings is None:
+            settings = await self.config.guild(guild).all()
+            for key in self.UNCACHED_GUILD_KEYS:
+                del settings[key]
+            self._guild_settings[guild.id] = settings
+        return settings
+
+    async def _get_global_settings(self) -> dict:
+        """Snapshot of the global config, loaded once and kept until a setter invalidates it."""
+        if self._global_settings is None:
+            self._global_settings = await self.config.all()
+        return self._global_settings
+
+    def _invalidate_settings(self, guild_id: Optional[int] = None):
+        """Drop a guild's snapshot, or all snapshots (guild and global) if no guild is given."""
+        if guild_id is None:
+            self._guild_settings.clear()
+            self._override_emojis.clear()
+            self._global_settings = None
+        else:
+            self._guild_settings.pop(guild_id, None)
+            self._override_emojis.pop(guild_id, None)
+
+    async def _get_provider_pool(self) -> Optional[ProviderPool]:
+        """Get the provider chain (primary model/base URL first, then fallbacks), or None if no key is set."""
+        if not self._providers_loaded:
+            api_tokens = await self.bot.get_shared_api_tokens("offtopic")
+            global_settings = await self._get_global_settings()
+            primary = {
+                "base_url": global_settings["openai_base_url"],
+                "model": global_settings["openai_model"],
+                "key_name": "openai_api_key",
+            }
+            self._provider_pool.configure([primary] + global_settings["providers"], api_tokens)
+            self._providers_loaded = True
+        return self._provider_pool if self._provider_pool.providers else None
 
     def _reset_client(self):
-        """Reset client to pick up new config."""
-        self._client = None
+        """Reset clients to pick up new config."""
+        self._providers_loaded = False
+        self._structured_unsupported.clear()
+
+    @commands.Cog.listener()
+    async def on_red_api_tokens_update(self, service_name: str, api_tokens: Dict[str, str]):
+        if service_name == "offtopic":
+            self._reset_client()
+
+    async def _get_topic_model(self, guild: discord.Guild) -> TopicModel:
+        """Get the guild's pre-filter topic model, loading it from config on first use."""
+        settings = await self._get_guild_settings(guild)
+        model = self._topic_models.get(guild.id)
+        if model is None:
+            model = TopicModel.from_dict(await self.config.guild(guild).topic_model())
+            self._topic_models[guild.id] = model
+        model.seed(settings["server_prompt"])
+        return model
+
+    async def _learn_on_topic(self, guild: discord.Guild, messages: List[discord.Message]):
+        """Feed messages that stayed in their channel into the guild's topic model."""
+        model = await self._get_topic_model(guild)
+        new = [msg for msg in messages if msg.id > model.last_id]
+        if not new:
+            return
+        model.learn(msg.content for msg in new)
+        model.last_id = max(msg.id for msg in new)
+        await self.config.guild(guild).topic_model.set(model.to_dict())
 
     def _check_rate_limit(self, guild_id: int, user_id: int) -> Optional[str]:
         """Check rate limits. Returns error message if blocked, None if OK."""
@@ -164,6 +298,29 @@ class OffTopic(commands.Cog):
 
         return None
 
+    def _check_access(self, guild: discord.Guild, user: discord.Member, settings: dict) -> Optional[str]:
+        """Membership age, rate limit and role checks for the user commands. Returns an error message or None."""
+        # Check 1-month membership requirement
+        member = guild.get_member(user.id)
+        if member and member.joined_at:
+            membership_cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+            if member.joined_at > membership_cutoff:
+                return "Arr, du musst mindestens 1 Monat auf dem Server sein!"
+
+        # Check rate limits
+        rate_error = self._check_rate_limit(guild.id, user.id)
+        if rate_error:
+            return rate_error
+
+        # Check if user has required role
+        allowed_role_ids = settings["allowed_role_ids"]
+        if allowed_role_ids:
+            user_role_ids = [r.id for r in user.roles]
+            if not any(role_id in user_role_ids for role_id in allowed_role_ids):
+                return "Arr, du hast keine Berechtigung für diesen Befehl, Landratte!"
+
+        return None
+
     # ==================== SLASH COMMAND ====================
 
     @app_commands.command(name="offtopic", description="Arr! Schaut ob hier wer vom Kurs abgekommen ist")
@@ -217,6 +374,13 @@ class OffTopic(commands.Cog):
 
         await self._run_offtopic_analysis(interaction, start_message, ziel)
 
+    @app_commands.command(name="wohin", description="Arr! Schaut welche Nachrichten eigentlich in einen anderen Kanal gehören")
+    @app_commands.guild_only()
+    async def wohin_slash(self, interaction: discord.Interaction):
+        """Suggest the right channel for misplaced messages."""
+        await interaction.response.defer()
+        await self._run_routing(interaction)
+
     # ==================== CORE LOGIC ====================
 
     async def _run_offtopic_analysis(
@@ -232,31 +396,12 @@ class OffTopic(commands.Cog):
 
         self.log.info(f"offtopic analysis by {user} ({user.id}) in #{channel.name} ({channel.id})")
 
-        # Check 1-month membership requirement
-        member = guild.get_member(user.id)
-        if member and member.joined_at:
-            membership_cutoff = datetime.now(timezone.utc) - timedelta(days=30)
-            if member.joined_at > membership_cutoff:
-                await interaction.followup.send(
-                    "Arr, du musst mindestens 1 Monat auf dem Server sein!",
-                    ephemeral=True
-                )
-                return
-
-        # Check rate limits
-        rate_error = self._check_rate_limit(guild.id, user.id)
-        if rate_error:
-            await interaction.followup.send(rate_error, ephemeral=True)
+        settings = await self._get_guild_settings(guild)
+        access_error = self._check_access(guild, user, settings)
+        if access_error:
+            await interaction.followup.send(access_error, ephemeral=True)
             return
 
-        # Check if user has required role
-        allowed_role_ids = await self.config.guild(guild).allowed_role_ids()
-        if allowed_role_ids:
-            user_role_ids = [r.id for r in user.roles]
-            if not any(role_id in user_role_ids for role_id in allowed_role_ids):
-                await interaction.followup.send("Arr, du hast keine Berechtigung für diesen Befehl, Landratte!", ephemeral=True)
-                return
-
         # Check if start_message is within 3 hours
         if start_message:
             cutoff = datetime.now(timezone.utc) - timedelta(hours=3)
@@ -268,7 +413,7 @@ class OffTopic(commands.Cog):
                 return
 
         # Determine destination channel
-        default_offtopic_id = await self.config.guild(guild).offtopic_channel_id()
+        default_offtopic_id = settings["offtopic_channel_id"]
         if ziel:
             destination_channel = ziel
             if destination_channel.id == channel.id:
@@ -320,22 +465,21 @@ class OffTopic(commands.Cog):
             )
         else:
             # Default off-topic: detect derailed conversations
-            server_prompt = await self.config.guild(guild).server_prompt()
+            server_prompt = settings["server_prompt"]
 
         # Check OpenAI API key
-        client = await self._get_openai_client()
-        if not client:
+        pool = await self._get_provider_pool()
+        if not pool:
             await interaction.followup.send(
                 "API-Schlüssel fehlt! Ein Admin muss `[p]set api offtopic openai_api_key,KEY` ausführen.",
                 ephemeral=True
             )
             return
 
-        # Check TransferChannel cog
-        tc_cog = self.bot.get_cog("TransferChannel")
-        if not tc_cog:
+        # Check permissions needed to re-post and delete messages
+        if not destination_channel.permissions_for(guild.me).manage_webhooks:
             await interaction.followup.send(
-                "TransferChannel Cog ist nicht installiert - ohne das kann ich keine Nachrichten verschieben!",
+                f"Mir fehlt die Berechtigung 'Webhooks verwalten' in {destination_channel.mention} - ohne das kann ich keine Nachrichten verschieben!",
                 ephemeral=True
             )
             return
@@ -363,8 +507,57 @@ class OffTopic(commands.Cog):
             await interaction.followup.send("Keine Nachrichten zum Analysieren gefunden.", ephemeral=True)
             return
 
+        # Local pre-filter: skip the LLM for obviously on-topic windows, otherwise narrow the window
+        llm_messages = messages
+        if not is_custom_destination and not user_suggested_id and settings["prefilter_enabled"]:
+            verdict = assess_window(await self._get_topic_model(guild), [msg.content for msg in messages])
+            if verdict.on_topic:
+                self.log.info(f"Pre-filter result: on-topic ({len(messages)} messages)")
+                # Not learned from: training on its own verdicts would make the pre-filter drift
+                self._record_usage(guild.id, "local", "prefiltered")
+                await interaction.followup.send("Alles klar hier! Keine Off-Topic Diskussion in den letzten 30 Nachrichten gefunden. Weiter so, Matrosen! ⚓")
+                return
+            if verdict.start_index:
+                self.log.debug(f"Pre-filter narrowed window to {len(messages) - verdict.start_index} of {len(messages)} messages")
+                llm_messages = messages[verdict.start_index:]
+
+        # Start collecting the move window as soon as the streamed answer names the first message
+        prefetch: Dict[str, asyncio.Task] = {}
+
+        def on_first_id(first_id: str):
+            msg = next((m for m in messages if str(m.id) == first_id), None)
+            if msg and first_id not in prefetch:
+                prefetch[first_id] = asyncio.create_task(self._collect_messages_from(channel, msg))
+
+        # Tell the user where they are if the analysis has to wait for a free slot
+        queued = False
+
+        async def report_queue(position: int):
+            nonlocal queued
+            queued = True
+            try:
+                await interaction.edit_original_response(
+                    content=f"⏳ Viel los gerade - du bist auf Platz {position} in der Warteschlange..."
+                )
+            except discord.HTTPException:
+                pass
+
         # Analyze with OpenAI
-        result = await self._analyze_messages(client, messages, server_prompt, user_suggested_id, is_custom_destination)
+        result = None
+        try:
+            result = await self._analyze_messages(
+                pool, llm_messages, server_prompt, user_suggested_id, is_custom_destination, on_first_id,
+                guild_id=guild.id, on_position=report_queue
+            )
+        finally:
+            stale = [task for first_id, task in prefetch.items() if result is None or first_id != result.first_offtopic_id]
+            for task in stale:
+                task.cancel()
+            if queued:
+                try:
+                    await interaction.delete_original_response()
+                except discord.HTTPException:
+                    pass
         if result is None:
             await interaction.followup.send("Konnte die Nachrichten nicht analysieren. Versuch's später nochmal!", ephemeral=True)
             return
@@ -373,6 +566,9 @@ class OffTopic(commands.Cog):
 
         if first_offtopic_id is None:
             self.log.info(f"Analysis result: on-topic")
+            if not is_custom_destination:
+                # Only what the LLM actually saw; the rest was cleared by the pre-filter alone
+                await self._learn_on_topic(guild, llm_messages)
             await interaction.followup.send("Alles klar hier! Keine Off-Topic Diskussion in den letzten 30 Nachrichten gefunden. Weiter so, Matrosen! ⚓")
             return
 
@@ -393,11 +589,31 @@ class OffTopic(commands.Cog):
             return
 
         # Count messages to be moved (first + all after)
-        messages_to_move = [first_offtopic_msg]
-        async for msg in channel.history(after=first_offtopic_msg, oldest_first=True):
-            messages_to_move.append(msg)
+        if first_offtopic_id in prefetch:
+            messages_to_move = await prefetch[first_offtopic_id]
+        else:
+            messages_to_move = await self._collect_messages_from(channel, first_offtopic_msg)
 
-        move_count = len(messages_to_move)
+        await self._vote_and_move(
+            channel, messages, first_offtopic_msg, len(messages_to_move), reason,
+            destination_channel, is_custom_destination,
+            lambda summary: interaction.followup.send(summary, wait=True)
+        )
+
+    async def _vote_and_move(
+        self,
+        channel: discord.TextChannel,
+        messages: List[discord.Message],
+        first_offtopic_msg: discord.Message,
+        move_count: int,
+        reason: str,
+        destination_channel: discord.TextChannel,
+        is_custom_destination: bool,
+        send_summary: Callable[[str], Awaitable[discord.Message]]
+    ):
+        """Post the vote summary, run the vote and move the messages if it passes."""
+        guild = channel.guild
+        settings = await self._get_guild_settings(guild)
 
         # Create summary message
         content_preview = first_offtopic_msg.content[:100]
@@ -406,8 +622,8 @@ class OffTopic(commands.Cog):
         # Quote each line for Discord markdown
         content_preview = content_preview.replace("\n", "\n> ")
 
-        vote_threshold = await self.config.guild(guild).vote_threshold()
-        vote_timeout = await self.config.guild(guild).vote_timeout()
+        vote_threshold = settings["vote_threshold"]
+        vote_timeout = settings["vote_timeout"]
         timeout_minutes = vote_timeout // 60
 
         if is_custom_destination:
@@ -445,24 +661,83 @@ class OffTopic(commands.Cog):
                 f"**Grund:** {reason}\n\n"
             )
 
-        summary_message = await interaction.followup.send(summary, wait=True)
+        summary_message = await send_summary(summary)
+
+        # Everything needed to finish the vote, persisted so it survives a reload
+        record = {
+            "channel_id": channel.id,
+            "first_message_id": first_offtopic_msg.id,
+            "destination_id": destination_channel.id,
+            "is_custom": is_custom_destination,
+            "threshold": vote_threshold,
+            "deadline": time.time() + vote_timeout,
+            "base_summary": base_summary,
+        }
+        vote_result = await self._handle_voting(summary_message, record)
+        if vote_result == "unloaded":
+            return
 
-        # Start voting
-        vote_result = await self._handle_voting(
-            channel, summary_message, vote_threshold, vote_timeout
+        await self._finish_vote(
+            vote_result, channel, summary_message, record,
+            first_offtopic_msg, destination_channel, messages
         )
 
+    async def _finish_vote(
+        self,
+        vote_result: str,
+        channel: discord.TextChannel,
+        summary_message: discord.Message,
+        record: dict,
+        first_offtopic_msg: Optional[discord.Message],
+        destination_channel: Optional[discord.TextChannel],
+        messages: Optional[List[discord.Message]] = None
+    ):
+        """Act on a vote result, then drop the persisted vote. ``messages`` is the analysed window, None for restored votes."""
+        try:
+            await self._apply_vote_result(
+                vote_result, channel, summary_message, record, first_offtopic_msg, destination_channel, messages
+            )
+        except asyncio.CancelledError:
+            # Unloading: keep the vote, the next load finishes the move
+            raise
+        except Exception:
+            await self._forget_vote(channel.guild.id, summary_message.id)
+            raise
+        await self._forget_vote(channel.guild.id, summary_message.id)
+
+    async def _apply_vote_result(
+        self,
+        vote_result: str,
+        channel: discord.TextChannel,
+        summary_message: discord.Message,
+        record: dict,
+        first_offtopic_msg: Optional[discord.Message],
+        destination_channel: Optional[discord.TextChannel],
+        messages: Optional[List[discord.Message]] = None
+    ):
+        """Act on a vote result (see _finish_vote)."""
+        guild = channel.guild
+        base_summary = record["base_summary"]
+        is_custom_destination = record["is_custom"]
+
         if vote_result == "approve":
             self.log.info(f"Vote passed: approved")
+            if first_offtopic_msg is None or destination_channel is None:
+                await summary_message.edit(content=base_summary + "❌ Beim Verschieben ist was schiefgelaufen!")
+                return
+            if messages and not is_custom_destination:
+                await self._learn_on_topic(guild, [msg for msg in messages if msg.id < first_offtopic_msg.id])
             await summary_message.edit(content=base_summary + f"⏳ Wird nach {destination_channel.mention} verschoben...")
             # Transfer and delete messages
-            result = await self._transfer_messages_from_interaction(
-                interaction, first_offtopic_msg, destination_channel, tc_cog
+            result = await self._transfer_messages(
+                first_offtopic_msg, destination_channel, summary_message, base_summary
             )
             if result:
-                count, jump_url = result
+                count, jump_url, problem = result
                 self.log.info(f"Transferred {count} messages to #{destination_channel.name}")
-                if is_custom_destination:
+                if problem:
+                    await summary_message.edit(content=base_summary + f"⚠️ **{problem}** {jump_url}")
+                elif is_custom_destination:
                     await summary_message.edit(content=base_summary + f"✅ **{count} Nachrichten nach {destination_channel.mention} verschoben!** {jump_url}")
                 else:
                     await summary_message.edit(content=base_summary + f"✅ **{count} Nachrichten nach {destination_channel.mention} verschifft!** {jump_url}\n\n🔨 Bleibt beim Thema - sonst geht's über die Planke!")
@@ -471,12 +746,356 @@ class OffTopic(commands.Cog):
 
         elif vote_result == "reject":
             self.log.info(f"Vote passed: rejected")
+            if messages and not is_custom_destination:
+                await self._learn_on_topic(guild, messages)
             await summary_message.edit(content=base_summary + "❌ **Die Crew hat abgestimmt: Bleibt alles hier!**")
 
         else:  # timeout
             self.log.info(f"Vote timed out")
             await summary_message.edit(content=base_summary + "⏰ **Abstimmung abgelaufen - keinen interessiert's wohl.**")
 
+    # ==================== AUTO DETECTION ====================
+
+    AUTO_COOLDOWN = 900  # seconds between automatic analyses of the same channel
+    AUTO_MIN_DOCS = 100  # topic model size needed before drift scores are trusted
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Score each new message in watched channels and trigger an analysis on drift."""
+        if message.guild is None or message.author.bot:
+            return
+        settings = await self._get_guild_settings(message.guild)
+        channel = message.channel
+        if channel.id not in settings["watch_channel_ids"]:
+            return
+
+        model = await self._get_topic_model(message.guild)
+        tracker = self._drift.setdefault(channel.id, DriftTracker())
+        drift = tracker.update(model.score(message.content))
+        if (
+            not tracker.ready
+            or drift < settings["watch_threshold"]
+            or model.docs < self.AUTO_MIN_DOCS
+            or channel.id in self._auto_running
+            or time.monotonic() < self._auto_cooldown.get(channel.id, 0)
+        ):
+            return
+        if await self.bot.cog_disabled_in_guild(self, message.guild):
+            return
+
+        self.log.info(f"Drift {drift:.2f} in #{channel.name} ({channel.id}), starting automatic analysis")
+        tracker.reset()
+        self._auto_running.add(channel.id)
+        self._auto_cooldown[channel.id] = time.monotonic() + self.AUTO_COOLDOWN
+        task = asyncio.create_task(self._run_auto_analysis(channel))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _run_auto_analysis(self, channel: discord.TextChannel):
+        """Analysis triggered by the drift watcher; posts the usual vote if something is found."""
+        guild = channel.guild
+        try:
+            settings = await self._get_guild_settings(guild)
+            destination_channel = guild.get_channel(settings["offtopic_channel_id"] or 0)
+            if not destination_channel or destination_channel.id == channel.id:
+                return
+            if not destination_channel.permissions_for(guild.me).manage_webhooks:
+                return
+            pool = await self._get_provider_pool()
+            if not pool:
+                return
+
+            messages = await self._fetch_recent_messages(channel)
+            if not messages:
+                return
+            verdict = assess_window(await self._get_topic_model(guild), [msg.content for msg in messages])
+            llm_messages = messages[verdict.start_index:] if not verdict.on_topic else messages
+
+            result = await self._analyze_messages(pool, llm_messages, settings["server_prompt"], guild_id=guild.id)
+            if result is None:
+                return
+            if result.first_offtopic_id is None:
+                self.log.info(f"Automatic analysis in #{channel.name}: on-topic")
+                await self._learn_on_topic(guild, llm_messages)
+                return
+
+            first_offtopic_msg = next((m for m in messages if str(m.id) == result.first_offtopic_id), None)
+            if not first_offtopic_msg:
+                return
+            self.log.info(f"Automatic analysis in #{channel.name}: off-topic from {result.first_offtopic_id} - {result.reason}")
+            messages_to_move = await self._collect_messages_from(channel, first_offtopic_msg)
+            await self._vote_and_move(
+                channel, messages, first_offtopic_msg, len(messages_to_move), result.reason,
+                destination_channel, False, lambda summary: channel.send(summary)
+            )
+        except Exception as e:
+            self.log.error(f"Automatic analysis in #{channel.name} failed: {e}")
+        finally:
+            self._auto_running.discard(channel.id)
+
+    # ==================== CHANNEL ROUTING ====================
+
+    ROUTE_CANDIDATES = 25  # channels considered per request at most
+    ROUTE_HISTORY = 100  # messages read to build a channel profile
+
+    async def _run_routing(self, interaction: discord.Interaction):
+        """Suggest a home channel for every misplaced stretch of the recent conversation."""
+        guild = interaction.guild
+        channel = interaction.channel
+        user = interaction.user
+
+        self.log.info(f"routing analysis by {user} ({user.id}) in #{channel.name} ({channel.id})")
+
+        settings = await self._get_guild_settings(guild)
+        access_error = self._check_access(guild, user, settings)
+        if access_error:
+            await interaction.followup.send(access_error, ephemeral=True)
+            return
+
+        messages = await self._fetch_recent_messages(channel)
+        if not messages:
+            await interaction.followup.send("Keine Nachrichten zum Analysieren gefunden.", ephemeral=True)
+            return
+
+        candidates = self._route_candidates(channel, user, settings)
+        if len(candidates) < 2:
+            await interaction.followup.send("Keine anderen Kanäle zur Auswahl!", ephemeral=True)
+            return
+        candidate_ids = {c.id for c in candidates}
+
+        # Score the window against all candidates locally; only unclear segments go to the LLM
+        router = await self._get_router(channel, candidates, messages[0])
+        segments = segment_window(router, [msg.content for msg in messages])
+        routes: Dict[int, Tuple[Optional[int], str]] = {}
+        undecided = []
+        for index, segment in enumerate(segments):
+            if segment.decisive:
+                routes[index] = (segment.channel_id, "passt laut Kanalprofil eindeutig dorthin")
+            else:
+                undecided.append(index)
+
+        if undecided:
+            self.log.debug(f"Routing: {len(segments) - len(undecided)} of {len(segments)} segments decided locally")
+            pool = await self._get_provider_pool()
+            llm_routes = None
+            if pool:
+                llm_routes = await self._route_with_llm(pool, channel, messages, segments, undecided, candidates, guild.id)
+            for index in undecided:
+                if llm_routes is None:
+                    # No LLM answer: fall back to the local best guess
+                    routes[index] = (segments[index].channel_id, "passt laut Kanalprofil am ehesten dorthin (unsicher)")
+                    continue
+                channel_id, reason = llm_routes.get(index + 1, (None, ""))
+                channel_id = int(channel_id) if channel_id and int(channel_id) in candidate_ids else None
+                routes[index] = (channel_id, reason)
+        else:
+            self._record_usage(guild.id, "local", "prefiltered")
+
+        lines = []
+        for index, segment in enumerate(segments):
+            channel_id, reason = routes[index]
+            if channel_id is None or channel_id == channel.id:
+                continue
+            target = guild.get_channel(channel_id)
+            if target is None:
+                continue
+            first = messages[segment.start]
+            count = segment.end - segment.start
+            preview = first.content.replace("\n", " ")[:80]
+            if len(first.content) > 80:
+                preview += "..."
+            lines.append(
+                f"> **{first.author.display_name}**: {preview}\n"
+                f"**{count} Nachricht{'en' if count != 1 else ''}** ab {first.jump_url} gehören nach {target.mention}"
+                + (f" - {reason[:150]}" if reason else "")
+            )
+
+        if not lines:
+            await interaction.followup.send(
+                f"Alles im richtigen Hafen! Die letzten {len(messages)} Nachrichten passen hierher. ⚓"
+            )
+            return
+
+        summary = "**🧭 Kurskorrektur!**\n\n" + "\n\n".join(lines)
+        footer = "\n\nZum Verschieben: Rechtsklick auf die erste Nachricht → Apps → *Off-Topic ab hier* mit dem Zielkanal."
+        await interaction.followup.send(summary[:2000 - len(footer)] + footer)
+
+    def _route_candidates(
+        self, channel: discord.TextChannel, user: discord.Member, settings: dict
+    ) -> List[discord.TextChannel]:
+        """The current channel plus channels both the bot and the user can use, off-topic channel first."""
+        me = channel.guild.me
+        candidates = []
+        for other in channel.guild.text_channels:
+            if other.id != channel.id:
+                bot_perms = other.permissions_for(me)
+                user_perms = other.permissions_for(user)
+                if not (bot_perms.view_channel and bot_perms.read_message_history):
+                    continue
+                if not (user_perms.view_channel and user_perms.send_messages):
+                    continue
+            candidates.append(other)
+        offtopic_id = settings["offtopic_channel_id"]
+        candidates.sort(key=lambda c: (c.id != channel.id, c.id != offtopic_id, c.position))
+        return candidates[:self.ROUTE_CANDIDATES]
+
+    async def _get_router(
+        self, channel: discord.TextChannel, candidates: List[discord.TextChannel], window_start: discord.Message
+    ) -> ChannelRouter:
+        """Guild router with fresh profiles for all candidates (stale ones rebuilt concurrently)."""
+        router = self._routers.setdefault(channel.guild.id, ChannelRouter())
+        by_id = {c.id: c for c in candidates}
+        router.retain(by_id)
+        # The current channel is profiled from before the window, so the window can't vote for itself
+        router.drop(channel.id)
+        semaphore = asyncio.Semaphore(4)
+
+        async def build(target: discord.TextChannel):
+            texts = []
+            try:
+                async with semaphore:
+                    before = window_start if target.id == channel.id else None
+                    async for msg in target.history(limit=self.ROUTE_HISTORY, before=before):
+                        if not msg.author.bot and msg.content:
+                            texts.append(msg.content)
+            except discord.HTTPException as e:
+                self.log.debug(f"Could not read #{target.name} for its profile: {e}")
+            router.update(ChannelProfile.build(target.id, target.name, target.topic, texts))
+
+        await asyncio.gather(*(build(by_id[channel_id]) for channel_id in router.stale(by_id)))
+        return router
+
+    async def _route_with_llm(
+        self, pool: ProviderPool, channel: discord.TextChannel, messages: List[discord.Message],
+        segments: List[RouteSegment], undecided: List[int], candidates: List[discord.TextChannel], guild_id: int
+    ) -> Optional[Dict[int, Tuple[Optional[str], str]]]:
+        """Ask the LLM about all undecided segments in one call. Returns {segment number: (channel ID, reason)}."""
+        global_settings = await self._get_global_settings()
+        model = global_settings["openai_model"]
+        budget = global_settings["prompt_token_budget"]
+
+        variant = "routing:" + ",".join(str(c.id) for c in candidates) + ":" + ",".join(
+            f"{segments[i].start}-{segments[i].end}" for i in undecided
+        )
+        cache_key = window_fingerprint(model, variant, "", messages)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            self._record_usage(guild_id, model, "cached")
+            return cached
+
+        channel_lines = "\n".join(
+            f"ID: {c.id} | #{c.name}" + (f" | {c.topic[:100]}" if c.topic else "") for c in candidates
+        )
+        segment_lines = "\n".join(
+            f"Abschnitt {i + 1}: ID {messages[segments[i].start].id} bis ID {messages[segments[i].end - 1].id}"
+            for i in undecided
+        )
+        messages_text, dropped = build_message_block(messages, None, budget, "")
+        if dropped:
+            self.log.debug(f"Prompt budget {budget}: dropped {dropped} of {len(messages)} messages")
+
+        system_prompt = f"""Du ordnest Discord-Nachrichten dem passenden Kanal zu.
+
+Die Nachrichten wurden in #{channel.name} gepostet. Verfügbare Kanäle:
+{channel_lines}
+
+Du erhältst die Nachrichten in chronologischer Reihenfolge und eine Liste von Abschnitten.
+Entscheide für jeden Abschnitt, in welchen Kanal er gehört. Wenn er in #{channel.name} richtig ist, gib null an.
+Sei zurückhaltend - nur einen anderen Kanal angeben, wenn der Abschnitt dort klar besser passt.
+
+Antworte NUR mit einem JSON-Objekt in diesem Format:
+{{"segments": [{{"segment": 1, "channel_id": "channel_id", "reason": "kurze Erklärung auf Deutsch"}}]}}
+Für Abschnitte, die hierher gehören: "channel_id": null
+
+WICHTIG: Antworte NUR mit validem JSON, kein anderer Text. Der reason MUSS auf Deutsch sein."""
+
+        user_prompt = f"""Nachrichten (älteste zuerst):
+{messages_text}
+
+Abschnitte:
+{segment_lines}
+
+Ordne jeden Abschnitt einem Kanal zu."""
+
+        request = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "max_tokens": 100 + 80 * len(undecided),
+            "temperature": 0.3,
+        }
+
+        async def attempt(provider: Provider) -> Dict[int, Tuple[Optional[str], str]]:
+            return await self._request_routing(provider, request, global_settings["structured_output"], guild_id)
+
+        try:
+            async with self._llm_scheduler.slot(guild_id):
+                routes = await pool.run(attempt, hedge=global_settings["hedge_requests"])
+        except Exception as e:
+            self.log.error(f"All LLM providers failed: {e}")
+            return None
+
+        self._analysis_cache.put(cache_key, routes)
+        return routes
+
+    async def _request_routing(
+        self, provider: Provider, request: dict, structured: bool, guild_id: int = 0
+    ) -> Dict[int, Tuple[Optional[str], str]]:
+        """Send one routing request to a provider and parse it. Raises on API or parse errors."""
+        client = provider.client
+        structured = structured and provider.base_url not in self._structured_unsupported
+
+        started = time.monotonic()
+        outcome = "error"
+        usage = None
+        try:
+            try:
+                response = await client.chat.completions.create(
+                    model=provider.model, **request,
+                    **({"response_format": ROUTING_RESPONSE_FORMAT} if structured else {})
+                )
+            except BadRequestError as e:
+                if not structured:
+                    raise
+                self.log.info(f"Structured output not supported by {provider.name}, falling back: {e}")
+                self._structured_unsupported.add(provider.base_url)
+                response = await client.chat.completions.create(model=provider.model, **request)
+
+            usage = response.usage
+            text = response.choices[0].message.content or ""
+            self.log.debug(f"OpenAI routing response ({provider.name}): {text}")
+            try:
+                routes = parse_routes(text)
+            except ValueError as e:
+                outcome = "parse_fail"
+                self.log.error(f"Failed to parse routing response from {provider.name}: {e}")
+                raise
+            outcome = "routed"
+            return routes
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self._record_usage(
+                guild_id, provider.model, outcome,
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0,
+                time.monotonic() - started
+            )
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+        router = self._routers.get(after.guild.id)
+        if router and (before.name != after.name or getattr(before, "topic", None) != getattr(after, "topic", None)):
+            router.drop(after.id)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        router = self._routers.get(channel.guild.id)
+        if router:
+            router.drop(channel.id)
+
     # ==================== ADMIN COMMANDS (PREFIX ONLY) ====================
 
     @commands.group(name="offtopic", invoke_without_command=True)
@@ -490,6 +1109,7 @@ class OffTopic(commands.Cog):
     async def set_channel(self, ctx: commands.Context, channel: discord.TextChannel):
         """Set the destination channel for off-topic messages."""
         await self.config.guild(ctx.guild).offtopic_channel_id.set(channel.id)
+        self._invalidate_settings(ctx.guild.id)
         await ctx.send(f"Off-topic destination set to {channel.mention}")
         await ctx.tick()
 
@@ -500,6 +1120,7 @@ class OffTopic(commands.Cog):
         async with self.config.guild(ctx.guild).allowed_role_ids() as role_ids:
             if role.id not in role_ids:
                 role_ids.append(role.id)
+        self._invalidate_settings(ctx.guild.id)
         await ctx.send(f"Added {role.mention} to allowed roles.")
         await ctx.tick()
 
@@ -508,18 +1129,23 @@ class OffTopic(commands.Cog):
     async def remove_role(self, ctx: commands.Context, role: discord.Role):
         """Remove a role from using the /offtopic command."""
         async with self.config.guild(ctx.guild).allowed_role_ids() as role_ids:
-            if role.id in role_ids:
+            removed = role.id in role_ids
+            if removed:
                 role_ids.remove(role.id)
-                await ctx.send(f"Removed {role.mention} from allowed roles.")
-                await ctx.tick()
-            else:
-                await ctx.send(f"{role.mention} was not in the allowed roles.")
+        if not removed:
+            await ctx.send(f"{role.mention} was not in the allowed roles.")
+            return
+        # Only after the block has written the new list, or a concurrent read re-caches the old one
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send(f"Removed {role.mention} from allowed roles.")
+        await ctx.tick()
 
     @offtopic_admin.command(name="clearroles")
     @checks.admin_or_permissions(manage_guild=True)
     async def clear_roles(self, ctx: commands.Context):
         """Clear all role restrictions (allow everyone)."""
         await self.config.guild(ctx.guild).allowed_role_ids.set([])
+        self._invalidate_settings(ctx.guild.id)
         await ctx.send("Role restrictions cleared. Everyone can now use /offtopic.")
         await ctx.tick()
 
@@ -546,6 +1172,7 @@ class OffTopic(commands.Cog):
                 return
 
             await self.config.guild(ctx.guild).server_prompt.set(msg.content)
+            self._invalidate_settings(ctx.guild.id)
             await ctx.send(f"Server prompt updated:\n> {msg.content}")
             await ctx.tick()
         except asyncio.TimeoutError:
@@ -558,23 +1185,259 @@ class OffTopic(commands.Cog):
         prompt = await self.config.guild(ctx.guild).server_prompt()
         await ctx.send(f"**Server prompt:**\n> {prompt}")
 
+    @offtopic_admin.command(name="prefilter")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_prefilter(self, ctx: commands.Context, enabled: bool):
+        """Enable or disable the local pre-filter that skips obviously on-topic windows."""
+        await self.config.guild(ctx.guild).prefilter_enabled.set(enabled)
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send(f"Pre-filter {'enabled' if enabled else 'disabled'}.")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="resetprefilter")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def reset_prefilter(self, ctx: commands.Context):
+        """Forget everything the pre-filter has learned for this server."""
+        await self.config.guild(ctx.guild).topic_model.clear()
+        self._topic_models.pop(ctx.guild.id, None)
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send("Pre-filter model reset.")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="watch")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def watch_channel(self, ctx: commands.Context, channel: discord.TextChannel):
+        """Automatically watch a channel for derailing conversations."""
+        async with self.config.guild(ctx.guild).watch_channel_ids() as channel_ids:
+            if channel.id not in channel_ids:
+                channel_ids.append(channel.id)
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send(f"Watching {channel.mention} for off-topic drift.")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="unwatch")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def unwatch_channel(self, ctx: commands.Context, channel: discord.TextChannel):
+        """Stop watching a channel."""
+        async with self.config.guild(ctx.guild).watch_channel_ids() as channel_ids:
+            if channel.id in channel_ids:
+                channel_ids.remove(channel.id)
+        self._invalidate_settings(ctx.guild.id)
+        self._drift.pop(channel.id, None)
+        await ctx.send(f"No longer watching {channel.mention}.")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="watchthreshold")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def set_watch_threshold(self, ctx: commands.Context, threshold: float):
+        """Set the drift score (0.1-1.0) at which a watched channel is analyzed."""
+        clamped = max(0.1, min(threshold, 1.0))
+        await self.config.guild(ctx.guild).watch_threshold.set(clamped)
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send(f"Watch threshold set to {clamped:.2f}")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="override")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def add_override(self, ctx: commands.Context, action: str, emoji: str):
+        """Let admins force a vote result by reacting with an emoji (action: approve or reject)."""
+        action = action.lower()
+        if action not in ("approve", "reject"):
+            await ctx.send("Action must be `approve` or `reject`.")
+            return
+        name = self._emoji_name(emoji)
+        guild_config = self.config.guild(ctx.guild)
+        async with guild_config.override_approve_emojis() as approve, guild_config.override_reject_emojis() as reject:
+            for names in (approve, reject):
+                if name in names:
+                    names.remove(name)
+            (approve if action == "approve" else reject).append(name)
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send(f"Admins reacting with `{name}` now force **{action}**.")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="removeoverride")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def remove_override(self, ctx: commands.Context, emoji: str):
+        """Remove an admin override emoji."""
+        name = self._emoji_name(emoji)
+        guild_config = self.config.guild(ctx.guild)
+        removed = False
+        async with guild_config.override_approve_emojis() as approve, guild_config.override_reject_emojis() as reject:
+            for names in (approve, reject):
+                if name in names:
+                    names.remove(name)
+                    removed = True
+        if not removed:
+            await ctx.send(f"`{name}` is not an override emoji.")
+            return
+        self._invalidate_settings(ctx.guild.id)
+        await ctx.send(f"Removed override emoji `{name}`.")
+        await ctx.tick()
+
+    @staticmethod
+    def _emoji_name(emoji: str) -> str:
+        """Name of a custom emoji given as <:name:id> or :name:, or the unicode emoji itself."""
+        match = re.fullmatch(r"<a?:(\w+):\d+>", emoji)
+        return match.group(1) if match else emoji.strip(":")
+
     @offtopic_admin.command(name="setmodel")
     @checks.is_owner()
     async def set_model(self, ctx: commands.Context, model: str):
         """Set the OpenAI model to use."""
         await self.config.openai_model.set(model)
+        self._invalidate_settings()
+        self._reset_client()
         await ctx.send(f"OpenAI model set to `{model}`")
         await ctx.tick()
 
+    @offtopic_admin.command(name="setbudget")
+    @checks.is_owner()
+    async def set_budget(self, ctx: commands.Context, tokens: int):
+        """Set the token budget for the message part of the prompt (500-20000)."""
+        clamped = max(500, min(tokens, 20000))
+        await self.config.prompt_token_budget.set(clamped)
+        self._invalidate_settings()
+        await ctx.send(f"Prompt token budget set to {clamped}")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="setstructured")
+    @checks.is_owner()
+    async def set_structured(self, ctx: commands.Context, enabled: bool):
+        """Request a JSON schema response_format from the API (falls back automatically if unsupported)."""
+        await self.config.structured_output.set(enabled)
+        self._invalidate_settings()
+        self._structured_unsupported.clear()
+        await ctx.send(f"Structured output {'enabled' if enabled else 'disabled'}.")
+        await ctx.tick()
+
     @offtopic_admin.command(name="setbaseurl")
     @checks.is_owner()
     async def set_base_url(self, ctx: commands.Context, url: str):
         """Set the OpenAI API base URL."""
         await self.config.openai_base_url.set(url)
+        self._invalidate_settings()
         self._reset_client()
         await ctx.send(f"OpenAI base URL set to `{url}`")
         await ctx.tick()
 
+    @offtopic_admin.command(name="addprovider")
+    @checks.is_owner()
+    async def add_provider(self, ctx: commands.Context, base_url: str, model: str, key_name: str = "openai_api_key"):
+        """Add a fallback OpenAI-compatible endpoint.
+
+        The API key is read from `[p]set api offtopic <key_name>,<KEY>`.
+        """
+        async with self.config.providers() as providers:
+            providers.append({"base_url": base_url, "model": model, "key_name": key_name})
+        self._invalidate_settings()
+        self._reset_client()
+        await ctx.send(f"Fallback provider added: `{model}` @ `{base_url}` (key `{key_name}`)")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="removeprovider")
+    @checks.is_owner()
+    async def remove_provider(self, ctx: commands.Context, index: int):
+        """Remove a fallback provider by its number in `[p]offtopic providers`."""
+        async with self.config.providers() as providers:
+            if not 1 <= index <= len(providers):
+                await ctx.send("No fallback provider with that number.")
+                return
+            removed = providers.pop(index - 1)
+        self._invalidate_settings()
+        self._reset_client()
+        await ctx.send(f"Removed fallback provider `{removed['model']}` @ `{removed['base_url']}`")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="hedge")
+    @checks.is_owner()
+    async def set_hedge(self, ctx: commands.Context, enabled: bool):
+        """Send a backup request when the primary is slower than its p90 latency."""
+        await self.config.hedge_requests.set(enabled)
+        self._invalidate_settings()
+        await ctx.send(f"Hedged requests {'enabled' if enabled else 'disabled'}.")
+        await ctx.tick()
+
+    @offtopic_admin.command(name="providers")
+    @checks.is_owner()
+    async def show_providers(self, ctx: commands.Context):
+        """List the LLM provider chain with health data."""
+        global_settings = await self._get_global_settings()
+        pool = await self._get_provider_pool()
+        health = {p.key: p for p in pool.providers} if pool else {}
+
+        entries = [{"base_url": global_settings["openai_base_url"], "model": global_settings["openai_model"], "key_name": "openai_api_key"}]
+        entries += global_settings["providers"]
+        lines = []
+        for index, entry in enumerate(entries):
+            label = "Primary" if index == 0 else f"{index}."
+            line = f"**{label}** `{entry['model']}` @ `{entry['base_url']}` (key `{entry['key_name']}`)"
+            provider = health.get((entry["base_url"], entry["model"], entry["key_name"]))
+            if provider is None:
+                line += " - no API key"
+            else:
+                p90 = provider.p90()
+                line += (
+                    f" - {provider.total_calls} calls, {provider.total_failures} failed"
+                    f", p90 {f'{p90:.1f}s' if p90 is not None else 'n/a'}"
+                    f"{'' if provider.is_healthy() else ', cooling down'}"
+                )
+            lines.append(line)
+        lines.append(f"Hedged requests: {'on' if global_settings['hedge_requests'] else 'off'}")
+        await ctx.send("\n".join(lines))
+
+    @offtopic_admin.command(name="usage")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def show_usage(self, ctx: commands.Context, days: int = 0):
+        """Show LLM token usage and latency for this server.
+
+        Percentiles are computed over the last 1000 calls, optionally limited to the last `days` days.
+        """
+        usage = await self.config.guild(ctx.guild).usage()
+        totals = usage.get("totals", {})
+        if not totals:
+            await ctx.send("No usage recorded yet.")
+            return
+
+        outcomes = totals.get("outcomes", {})
+        embed = discord.Embed(title="Off-Topic Usage", color=await ctx.embed_color())
+        embed.add_field(
+            name="Totals",
+            value=(
+                f"{totals['calls']} entries\n"
+                f"{totals['prompt_tokens']:,} prompt / {totals['completion_tokens']:,} completion tokens"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Outcomes",
+            value="\n".join(f"{name}: {count}" for name, count in sorted(outcomes.items())) or "-",
+            inline=False
+        )
+
+        since = time.time() - days * 86400 if days > 0 else None
+        for model, stats in summarize(usage.get("log", []), since).items():
+            calls = stats["calls"]
+            embed.add_field(
+                name=f"`{model}`",
+                value=(
+                    f"{calls} calls, Ø {stats['prompt'] // calls} / {stats['completion'] // calls} tokens\n"
+                    f"Latency p50 {stats['p50']} ms, p90 {stats['p90']} ms, p99 {stats['p99']} ms\n"
+                    + ", ".join(f"{name} {count}" for name, count in sorted(stats["outcomes"].items()))
+                ),
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
+    @offtopic_admin.command(name="resetusage")
+    @checks.admin_or_permissions(manage_guild=True)
+    async def reset_usage(self, ctx: commands.Context):
+        """Clear the recorded usage for this server."""
+        async with self._usage_lock:
+            await self.config.guild(ctx.guild).usage.clear()
+        await ctx.send("Usage statistics cleared.")
+        await ctx.tick()
+
     @offtopic_admin.command(name="settings")
     @checks.admin_or_permissions(manage_guild=True)
     async def show_settings(self, ctx: commands.Context):
@@ -621,20 +1484,50 @@ class OffTopic(commands.Cog):
             value=f"{guild_config['vote_timeout'] // 60} minutes",
             inline=True
         )
+        watched = [ctx.guild.get_channel(cid) for cid in guild_config["watch_channel_ids"]]
+        watched = [c.mention for c in watched if c]
+        embed.add_field(
+            name="Auto-Watch",
+            value=f"{', '.join(watched)} (threshold {guild_config['watch_threshold']:.2f})" if watched else "Off",
+            inline=False
+        )
+        embed.add_field(
+            name="Admin Overrides",
+            value=(
+                f"Approve: {', '.join(guild_config['override_approve_emojis']) or 'none'}\n"
+                f"Reject: {', '.join(guild_config['override_reject_emojis']) or 'none'}"
+            ),
+            inline=False
+        )
+        topic_docs = guild_config["topic_model"].get("docs", 0)
+        embed.add_field(
+            name="Pre-Filter",
+            value=f"{'On' if guild_config['prefilter_enabled'] else 'Off'} ({topic_docs} messages learned)",
+            inline=True
+        )
         embed.add_field(
             name="OpenAI Model",
             value=f"`{global_config['openai_model']}`",
             inline=True
         )
+        embed.add_field(
+            name="Prompt Budget",
+            value=f"{global_config['prompt_token_budget']} tokens",
+            inline=True
+        )
 
         # Check API key status
         api_keys = await self.bot.get_shared_api_tokens("offtopic")
         api_status = "Configured" if api_keys.get("openai_api_key") else "Not set"
         embed.add_field(name="API Key", value=api_status, inline=True)
 
-        # Check TransferChannel
-        tc_status = "Installed" if self.bot.get_cog("TransferChannel") else "Not installed"
-        embed.add_field(name="TransferChannel", value=tc_status, inline=True)
+        # Check webhook permission in the off-topic channel
+        if offtopic_channel:
+            can_move = offtopic_channel.permissions_for(ctx.guild.me).manage_webhooks
+            webhook_status = "OK" if can_move else "Missing Manage Webhooks"
+        else:
+            webhook_status = "-"
+        embed.add_field(name="Transfer Webhooks", value=webhook_status, inline=True)
 
         await ctx.send(embed=embed)
 
@@ -658,24 +1551,41 @@ class OffTopic(commands.Cog):
         # Return in chronological order (oldest first)
         return list(reversed(messages))
 
+    async def _collect_messages_from(
+        self, channel: discord.TextChannel, first_msg: discord.Message
+    ) -> List[discord.Message]:
+        """Collect a message and everything posted after it."""
+        collected = [first_msg]
+        async for msg in channel.history(after=first_msg, oldest_first=True):
+            collected.append(msg)
+        return collected
+
     async def _analyze_messages(
-        self, client: AsyncOpenAI, messages: List[discord.Message], server_prompt: str,
-        user_suggested_id: str = None, is_wrong_channel: bool = False
-    ) -> Optional[Tuple[Optional[str], str]]:
+        self, pool: ProviderPool, messages: List[discord.Message], server_prompt: str,
+        user_suggested_id: str = None, is_wrong_channel: bool = False,
+        on_first_id: Optional[Callable[[str], None]] = None,
+        guild_id: int = 0, on_position: Optional[PositionCallback] = None
+    ) -> Optional[AnalysisResult]:
         """Analyze messages with OpenAI to find off-topic or wrong-channel content."""
-        model = await self.config.openai_model()
-
-        # Format messages for the prompt
-        formatted = []
-        for msg in messages:
-            content = msg.content.replace('\n', ' ')[:200]
-            if user_suggested_id and str(msg.id) == user_suggested_id:
-                marker = " <<<< USER VERMUTET HIER BEGINNT ES"
-            else:
-                marker = ""
-            formatted.append(f"ID: {msg.id} | Author: {msg.author.display_name} | Content: {content}{marker}")
-
-        messages_text = "\n".join(formatted)
+        global_settings = await self._get_global_settings()
+        model = global_settings["openai_model"]
+        budget = global_settings["prompt_token_budget"]
+
+        # Same window, same prompt -> same answer; skip the round-trip
+        variant = f"{'wrong_channel' if is_wrong_channel else 'offtopic'}:{user_suggested_id or ''}:{budget}"
+        cache_key = window_fingerprint(model, variant, server_prompt, messages)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            self.log.debug(f"Analysis cache hit ({cache_key[:12]})")
+            self._record_usage(guild_id, model, "cached")
+            return cached
+
+        # Format messages for the prompt, oldest context dropped first if over budget
+        messages_text, dropped = build_message_block(
+            messages, user_suggested_id, budget, " <<<< USER VERMUTET HIER BEGINNT ES"
+        )
+        if dropped:
+            self.log.debug(f"Prompt budget {budget}: dropped {dropped} of {len(messages)} messages")
 
         if is_wrong_channel:
             # Wrong channel detection prompt
@@ -728,103 +1638,291 @@ WICHTIG: Antworte NUR mit validem JSON, kein anderer Text. Der reason MUSS auf D
 
 Finde die ERSTE Nachricht wo die Konversation entgleist ist (falls vorhanden)."""
 
-        self.log.debug(f"OpenAI request - model: {model}")
+        self.log.debug(f"OpenAI request - providers: {', '.join(p.name for p in pool.providers)}")
         self.log.debug(f"System prompt: {system_prompt}")
         self.log.debug(f"User prompt: {user_prompt}")
 
-        try:
-            response = await client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_tokens=200,
-                temperature=0.3
+        request = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "max_tokens": 300,
+            "temperature": 0.3,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+
+        async def attempt(provider: Provider) -> AnalysisResult:
+            return await self._request_analysis(
+                provider, request, global_settings["structured_output"], on_first_id, guild_id
             )
 
-            content = response.choices[0].message.content.strip()
-            self.log.debug(f"OpenAI response: {content}")
+        try:
+            async with self._llm_scheduler.slot(guild_id, on_position):
+                analysis = await pool.run(attempt, hedge=global_settings["hedge_requests"])
+        except Exception as e:
+            self.log.error(f"All LLM providers failed: {e}")
+            return None
 
-            # Parse JSON response
-            # Try to extract JSON if wrapped in markdown
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
+        self._analysis_cache.put(cache_key, analysis)
+        return analysis
+
+    async def _request_analysis(
+        self, provider: Provider, request: dict, structured: bool,
+        on_first_id: Optional[Callable[[str], None]] = None, guild_id: int = 0
+    ) -> AnalysisResult:
+        """Stream one analysis request from a provider and parse it. Raises on API or parse errors."""
+        client = provider.client
+        structured = structured and provider.base_url not in self._structured_unsupported
+
+        parser = StreamingResultParser()
+        started = time.monotonic()
+        outcome = "error"
+        usage = None
+        try:
+            try:
+                stream = await client.chat.completions.create(
+                    model=provider.model, **request,
+                    **({"response_format": ANALYSIS_RESPONSE_FORMAT} if structured else {})
+                )
+            except BadRequestError as e:
+                if not structured:
+                    raise
+                # Endpoint doesn't do json_schema; remember and fall back to prompt-only JSON
+                self.log.info(f"Structured output not supported by {provider.name}, falling back: {e}")
+                self._structured_unsupported.add(provider.base_url)
+                stream = await client.chat.completions.create(model=provider.model, **request)
+
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta and parser.feed(delta) and on_first_id and parser.first_offtopic_id:
+                    on_first_id(parser.first_offtopic_id)
+
+            self.log.debug(f"OpenAI response ({provider.name}): {parser.text}")
+            try:
+                result = parser.result()
+            except ValueError as e:
+                outcome = "parse_fail"
+                self.log.error(f"Failed to parse response from {provider.name}: {e}")
+                self.log.error(f"Response was: {parser.text}")
+                raise
+            outcome = "flagged" if result.first_offtopic_id else "ontopic"
+            return result
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            self._record_usage(
+                guild_id, provider.model, outcome,
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0,
+                time.monotonic() - started
+            )
 
-            result = json.loads(content)
-            return result.get("first_offtopic_id"), result.get("reason", "")
+    def _record_usage(
+        self, guild_id: int, model: str, outcome: str,
+        prompt_tokens: int = 0, completion_tokens: int = 0, latency: float = 0.0
+    ):
+        """Queue a usage entry for the guild's rolling call log (written in the background)."""
+        if not guild_id:
+            return
+        entry = make_entry(model, outcome, prompt_tokens, completion_tokens, latency)
+        task = asyncio.create_task(self._write_usage(guild_id, entry))
+        self._usage_writes.add(task)
+        task.add_done_callback(self._usage_writes.discard)
+
+    async def _write_usage(self, guild_id: int, entry: list):
+        async with self._usage_lock:
+            async with self.config.guild_from_id(guild_id).usage() as usage:
+                add_entry(usage, entry)
+
+    async def _handle_voting(self, summary_message: discord.Message, record: dict, restored: bool = False) -> str:
+        """Run a vote on the summary message. Returns 'approve', 'reject', 'timeout' or 'unloaded'."""
+        guild_id = summary_message.guild.id
+        vote = PendingVote(summary_message.id, guild_id, record)
+        # Register before reacting, so no reaction event can slip through
+        self._votes[summary_message.id] = vote
+        try:
+            if restored:
+                await self._recount_votes(vote, summary_message)
+            else:
+                async with self.config.guild_from_id(guild_id).pending_votes() as pending:
+                    pending[str(summary_message.id)] = record
+                await summary_message.add_reaction(THUMBS_UP)
+                await summary_message.add_reaction(THUMBS_DOWN)
+                # The bot's own reactions count, like in reaction.count
+                vote.add(THUMBS_UP, self.bot.user.id)
+                vote.add(THUMBS_DOWN, self.bot.user.id)
+
+            remaining = int(vote.deadline - time.time())
+            self.log.info(f"Voting {'resumed' if restored else 'started'} (threshold: {vote.threshold}, timeout: {remaining}s)")
+            result = await vote.wait()
+        finally:
+            if self._votes.get(summary_message.id) is vote:
+                del self._votes[summary_message.id]
+
+        if result == "approve":
+            # Kept until the move is done, so a reload mid-transfer picks it up again
+            record["approved"] = True
+            async with self.config.guild_from_id(guild_id).pending_votes() as pending:
+                pending[str(summary_message.id)] = record
+        return result
+
+    async def _forget_vote(self, guild_id: int, message_id: int):
+        async with self.config.guild_from_id(guild_id).pending_votes() as pending:
+            pending.pop(str(message_id), None)
+
+    async def _get_override_emojis(self, guild: discord.Guild) -> Tuple[frozenset, frozenset]:
+        """Approve/reject override emoji names as frozen sets, rebuilt when the settings change."""
+        emojis = self._override_emojis.get(guild.id)
+        if emojis is None:
+            settings = await self._get_guild_settings(guild)
+            emojis = (frozenset(settings["override_approve_emojis"]), frozenset(settings["override_reject_emojis"]))
+            self._override_emojis[guild.id] = emojis
+        return emojis
+
+    def _is_admin(self, member: discord.Member) -> bool:
+        """Cached administrator check, invalidated by member and role updates."""
+        cache = self._admin_cache.setdefault(member.guild.id, {})
+        is_admin = cache.get(member.id)
+        if is_admin is None:
+            is_admin = not member.bot and member.guild_permissions.administrator
+            cache[member.id] = is_admin
+        return is_admin
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.roles != after.roles:
+            self._admin_cache.get(after.guild.id, {}).pop(after.id, None)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        self._admin_cache.get(member.guild.id, {}).pop(member.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.permissions != after.permissions:
+            self._admin_cache.pop(after.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self._admin_cache.pop(role.guild.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+        if before.owner_id != after.owner_id:
+            self._admin_cache.pop(after.id, None)
+
+    async def _recount_votes(self, vote: PendingVote, summary_message: discord.Message):
+        """Rebuild the tally of a restored vote from the reactions added while we were away."""
+        approve, reject = await self._get_override_emojis(summary_message.guild)
+        for reaction in summary_message.reactions:
+            emoji_name = getattr(reaction.emoji, 'name', str(reaction.emoji))
+            if emoji_name in approve or emoji_name in reject:
+                result = "approve" if emoji_name in approve else "reject"
+                async for user in reaction.users():
+                    if isinstance(user, discord.Member) and self._is_admin(user):
+                        self.log.info(f"Admin {user} forced {result} with :{emoji_name}:")
+                        vote.resolve(result)
+                        return
+            elif str(reaction.emoji) in vote.voters:
+                async for user in reaction.users():
+                    vote.add(str(reaction.emoji), user.id)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        vote = self._votes.get(payload.message_id)
+        if vote is None:
+            return
 
-        except json.JSONDecodeError as e:
-            self.log.error(f"Failed to parse OpenAI response as JSON: {e}")
-            self.log.error(f"Response was: {content}")
-            return None
-        except Exception as e:
-            self.log.error(f"OpenAI API error: {e}")
-            return None
+        guild = self.bot.get_guild(vote.guild_id)
+        if guild is None:
+            return
+        approve, reject = await self._get_override_emojis(guild)
+        emoji_name = payload.emoji.name
+        if emoji_name in approve or emoji_name in reject:
+            member = payload.member
+            if member is not None and self._is_admin(member):
+                result = "approve" if emoji_name in approve else "reject"
+                self.log.info(f"Admin {member} forced {result} with :{emoji_name}:")
+                vote.resolve(result)
+            return
 
-    async def _handle_voting(
-        self,
-        channel: discord.TextChannel,
-        summary_message: discord.Message,
-        threshold: int,
-        timeout: int
-    ) -> str:
-        """Handle the voting process. Returns 'approve', 'reject', or 'timeout'."""
-        await summary_message.add_reaction("\N{THUMBS UP SIGN}")
-        await summary_message.add_reaction("\N{THUMBS DOWN SIGN}")
+        vote.add(str(payload.emoji), payload.user_id)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        vote = self._votes.get(payload.message_id)
+        if vote is not None:
+            vote.remove(str(payload.emoji), payload.user_id)
+
+    async def _restore_votes(self):
+        """Resume votes that were still running when the cog was unloaded."""
+        await self.bot.wait_until_red_ready()
+        all_guilds = await self.config.all_guilds()
+        for guild_id, data in all_guilds.items():
+            for message_id, record in data.get("pending_votes", {}).items():
+                task = asyncio.create_task(self._resume_vote(guild_id, int(message_id), record))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
+
+    async def _resume_vote(self, guild_id: int, message_id: int, record: dict):
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(record["channel_id"]) if guild else None
+        if channel is None:
+            await self._forget_vote(guild_id, message_id)
+            return
+        try:
+            summary_message = await channel.fetch_message(message_id)
+        except discord.NotFound:
+            await self._forget_vote(guild_id, message_id)
+            return
+        except discord.HTTPException as e:
+            self.log.warning(f"Could not restore vote {message_id}: {e}")
+            return
 
-        self.log.info(f"Voting started (threshold: {threshold}, timeout: {timeout}s)")
-        end_time = datetime.now(timezone.utc) + timedelta(seconds=timeout)
+        if record.get("approved"):
+            # The vote had passed but the move didn't finish
+            self.log.info(f"Resuming approved move for vote {message_id}")
+            vote_result = "approve"
+        else:
+            vote_result = await self._handle_voting(summary_message, record, restored=True)
+            if vote_result == "unloaded":
+                return
 
-        while datetime.now(timezone.utc) < end_time:
+        first_offtopic_msg = None
+        if vote_result == "approve":
             try:
-                msg = await channel.fetch_message(summary_message.id)
-            except discord.NotFound:
-                return "timeout"
-
-            thumbs_up = thumbs_down = 0
-            for reaction in msg.reactions:
-                emoji_name = getattr(reaction.emoji, 'name', str(reaction.emoji))
-
-                # Admin override emojis
-                if emoji_name in ['SadgeBusiness', 'Okay', 'subi', 'grrr', 'HYPERS', 'YEP', 'dies']:
-                    async for user in reaction.users():
-                        if not user.bot and user.guild_permissions.administrator:
-                            self.log.info(f"Admin {user} forced approve with :{emoji_name}:")
-                            return "approve"
-                elif emoji_name in ['unsure', 'BRUH']:
-                    async for user in reaction.users():
-                        if not user.bot and user.guild_permissions.administrator:
-                            self.log.info(f"Admin {user} forced reject with :{emoji_name}:")
-                            return "reject"
-
-                # Regular vote counting
-                if str(reaction.emoji) == "\N{THUMBS UP SIGN}":
-                    thumbs_up = reaction.count
-                elif str(reaction.emoji) == "\N{THUMBS DOWN SIGN}":
-                    thumbs_down = reaction.count
-
-            self.log.debug(f"Vote count: {thumbs_up} approve, {thumbs_down} reject")
-
-            if thumbs_up >= threshold:
-                return "approve"
-            if thumbs_down >= threshold:
-                return "reject"
-
-            await asyncio.sleep(5)
-
-        return "timeout"
-
-    async def _transfer_messages_from_interaction(
+                first_offtopic_msg = await channel.fetch_message(record["first_message_id"])
+            except discord.HTTPException:
+                # Already moved (the move goes oldest first), so continue with what is still here;
+                # nothing newer than the vote itself was voted on
+                async for msg in channel.history(
+                    after=discord.Object(id=record["first_message_id"]), oldest_first=True, limit=1
+                ):
+                    if msg.id < summary_message.id:
+                        first_offtopic_msg = msg
+        await self._finish_vote(
+            vote_result, channel, summary_message, record,
+            first_offtopic_msg, guild.get_channel(record["destination_id"])
+        )
+
+    async def _transfer_messages(
         self,
-        interaction: discord.Interaction,
         first_offtopic_msg: discord.Message,
         destination: discord.TextChannel,
-        tc_cog
-    ) -> Optional[Tuple[int, str]]:
-        """Transfer messages using TransferChannel cog (from slash command)."""
+        summary_message: discord.Message,
+        base_summary: str
+    ) -> Optional[Tuple[int, str, str]]:
+        """Transfer messages through the built-in webhook engine and delete the originals.
+
+        Returns the number moved, a jump URL and, if not everything could be moved, a note saying so.
+        """
         source = first_offtopic_msg.channel
 
         try:
@@ -839,11 +1937,6 @@ Finde die ERSTE Nachricht wo die Konversation entgleist ist (falls vorhanden).""
             if not messages_to_transfer:
                 return None
 
-            count = len(messages_to_transfer)
-
-            # TransferChannel reverses the list, so pass newest-first
-            messages_to_transfer.reverse()
-
             # Post header message in destination with source info
             context_msg = None
             async for msg in source.history(before=first_offtopic_msg, limit=1):
@@ -853,30 +1946,48 @@ Finde die ERSTE Nachricht wo die Konversation entgleist ist (falls vorhanden).""
             header = f"📥 Aus {source.mention} verschoben{context_link}"
             await destination.send(header)
 
-            # Use TransferChannel's transfer_messages method directly
-            await tc_cog.transfer_messages(
-                await self.bot.get_context(first_offtopic_msg),
-                source=source,
-                destination=destination,
-                way="webhooks",
-                messages=messages_to_transfer
-            )
+            async def render_progress(moved: int, deleted: int, total: int):
+                try:
+                    await summary_message.edit(
+                        content=base_summary + f"⏳ Wird nach {destination.mention} verschoben... ({moved}/{total} verschoben, {deleted} gelöscht)"
+                    )
+                except discord.HTTPException:
+                    pass
 
-            # Delete originals
-            for msg in messages_to_transfer:
+            async def report_queue(position: int):
                 try:
-                    await msg.delete()
+                    await summary_message.edit(
+                        content=base_summary + f"⏳ Wartet auf Verschiebung (Platz {position} in der Warteschlange)..."
+                    )
                 except discord.HTTPException:
                     pass
 
-            # Get jump URL to first message in destination
-            jump_url = ""
-            async for msg in destination.history(limit=count):
-                jump_url = msg.jump_url
+            # Summary edits are throttled to one every 2 seconds
+            reporter = ProgressReporter(render_progress)
+            try:
+                async with self._transfer_scheduler.slot(destination.guild.id, report_queue):
+                    result = await self._transfer.transfer(
+                        messages_to_transfer, destination, reporter.update, delete_originals=True
+                    )
+            finally:
+                await reporter.close()
+            if result.skipped:
+                self.log.warning(f"{len(result.skipped)} message(s) could not be transferred and were left in place")
+            if not result.moved:
+                if result.error:
+                    await source.send(f"Error transferring messages: {result.error}")
+                return None
 
-            return count, jump_url
+            problem = ""
+            if result.error or result.skipped:
+                reason = result.error or f"{len(result.skipped)} Nachricht(en) ließen sich nicht übertragen"
+                problem = (
+                    f"{len(result.moved)} von {len(messages_to_transfer)} Nachrichten nach {destination.mention} "
+                    f"verschoben, der Rest bleibt hier: {reason}"
+                )
+            return len(result.moved), result.jump_url, problem
 
         except Exception as e:
             self.log.error(f"Transfer error: {e}")
-            await interaction.channel.send(f"Error transferring messages: {e}")
+            await source.send(f"Error transferring messages: {e}")
             return None
@@ -0,0 +1,161 @@
+from typing import Dict, Iterable, List, Optional
+import math
+import re
+
+
+_NOISE_RE = re.compile(r"<a?:\w+:\d+>|<[@#&!]+\d+>|https?://\S+")
+_TOKEN_RE = re.compile(r"[a-z0-9äöüß][a-z0-9äöüß+#._-]{2,}")
+
+STOPWORDS = frozenset("""
+aber alle allem allen aller alles also auch auf aus bei beim bin bis bist da dabei damit dann das
+dass dem den denn der des die dies diese diesem diesen dieser dieses doch dort durch ein eine einem
+einen einer eines einfach er es etwas euch euer für gar gibt gut habe haben hab hat hatte hier hin
+ich ihm ihn ihr ihre immer ist jetzt kann kein keine mal man mehr mein meine mich mir mit muss nach
+nein nicht nichts noch nur ob oder ohne schon sehr sein seine sich sie sind so soll über um und uns
+unser von vor war waren warum was weil wenn wer wie wieder wir wird wo zu zum zur
+about after all also and any are because been but can could did does doing don for from get got had
+has have here how into its just like more not now off one only other our out really she should some
+than that the their them then there these they this too very was were what when where which who why
+will with would you your yes lol lmao haha xd
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase content terms of a message (no stopwords, mentions, emoji or URLs)."""
+    text = _NOISE_RE.sub(" ", text.lower())
+    return [t.strip("._-") for t in _TOKEN_RE.findall(text) if t not in STOPWORDS]
+
+
+class TopicModel:
+    """Keyword model of what a guild talks about, built from on-topic messages.
+
+    Each learned message counts as one document. A message is scored by the share of its
+    IDF weight that falls on terms the model already knows; unknown terms carry the maximum
+    weight, so the score stays conservative while the model is small.
+    """
+
+    MAX_TERMS = 5000
+    SEED_DF = 5  # server prompt terms count as if seen in this many documents
+    MIN_TERMS = 2  # shorter messages ("lol", "ja genau") are neutral
+
+    def __init__(self, docs: int = 0, df: Optional[Dict[str, int]] = None, last_id: int = 0):
+        self.docs = docs
+        self.df: Dict[str, int] = df or {}
+        self.last_id = last_id
+        self._seed: frozenset = frozenset()
+        self._seed_text: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "TopicModel":
+        data = data or {}
+        return cls(data.get("docs", 0), dict(data.get("df", {})), data.get("last_id", 0))
+
+    def to_dict(self) -> dict:
+        return {"docs": self.docs, "df": self.df, "last_id": self.last_id}
+
+    def seed(self, text: str):
+        """Use the server prompt as prior knowledge about on-topic terms."""
+        if text != self._seed_text:
+            self._seed = frozenset(tokenize(text))
+            self._seed_text = text
+
+    def learn(self, texts: Iterable[str]):
+        """Add on-topic documents to the model."""
+        for text in texts:
+            terms = set(tokenize(text))
+            if not terms:
+                continue
+            self.docs += 1
+            for term in terms:
+                self.df[term] = self.df.get(term, 0) + 1
+        if len(self.df) > self.MAX_TERMS:
+            keep = sorted(self.df.items(), key=lambda kv: kv[1], reverse=True)[: self.MAX_TERMS * 4 // 5]
+            self.df = dict(keep)
+
+    def _df(self, term: str) -> int:
+        df = self.df.get(term, 0)
+        if term in self._seed:
+            df = max(df, self.SEED_DF)
+        return df
+
+    def score(self, text: str) -> Optional[float]:
+        """Share (0..1) of a message's IDF weight on known terms, or None if too short to judge."""
+        terms = tokenize(text)
+        if len(terms) < self.MIN_TERMS:
+            return None
+        n = self.docs + self.SEED_DF
+        known = total = 0.0
+        for term in terms:
+            df = self._df(term)
+            weight = math.log((n + 1) / (df + 1)) + 1
+            total += weight
+            if df >= 2:
+                known += weight
+        return known / total
+
+
+class PrefilterVerdict:
+    """Result of the local pre-filter for a message window."""
+
+    def __init__(self, on_topic: bool, start_index: int = 0):
+        self.on_topic = on_topic
+        self.start_index = start_index
+
+
+def assess_window(
+    model: TopicModel, texts: List[str], threshold: float = 0.5,
+    min_run: int = 3, context: int = 3, min_docs: int = 100
+) -> PrefilterVerdict:
+    """Decide whether a window is obviously on-topic and where the suspicious part starts.
+
+    A window is only cleared when the model has seen enough documents and there is no run of
+    ``min_run`` low-scoring messages (neutral messages neither start nor break a run).
+    Otherwise the LLM window is narrowed to the first such run plus some context before it.
+    """
+    if model.docs < min_docs:
+        return PrefilterVerdict(False, 0)
+
+    run_start = None
+    run_len = 0
+    for index, text in enumerate(texts):
+        score = model.score(text)
+        if score is None:
+            continue
+        if score < threshold:
+            if run_len == 0:
+                run_start = index
+            run_len += 1
+            if run_len >= min_run:
+                return PrefilterVerdict(False, max(0, run_start - context))
+        else:
+            run_len = 0
+
+    return PrefilterVerdict(True, len(texts))
+
+
+class DriftTracker:
+    """Rolling off-topic drift of a channel, updated in O(terms) per message.
+
+    Keeps an exponentially weighted average of (1 - score) over judgeable messages, so
+    no window has to be stored or rescanned.
+    """
+
+    def __init__(self, alpha: float = 0.2, warmup: int = 8):
+        self.alpha = alpha
+        self.warmup = warmup
+        self.drift = 0.0
+        self.samples = 0
+
+    def update(self, score: Optional[float]) -> float:
+        if score is not None:
+            self.drift += self.alpha * ((1.0 - score) - self.drift)
+            self.samples += 1
+        return self.drift
+
+    @property
+    def ready(self) -> bool:
+        return self.samples >= self.warmup
+
+    def reset(self):
+        self.drift = 0.0
+        self.samples = 0
@@ -0,0 +1,155 @@
+from openai import AsyncOpenAI
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+import asyncio
+import collections
+import logging
+import time
+
+
+T = TypeVar("T")
+
+
+class Provider:
+    """One OpenAI-compatible endpoint/model pair with rolling health data."""
+
+    MIN_SAMPLES = 5  # latency samples needed before p90 is trusted
+    FAILURE_THRESHOLD = 3  # consecutive failures before cooling down
+
+    def __init__(self, base_url: str, model: str, key_name: str = "openai_api_key"):
+        self.base_url = base_url
+        self.model = model
+        self.key_name = key_name
+        self.client: Optional[AsyncOpenAI] = None
+        self.latencies = collections.deque(maxlen=50)
+        self.consecutive_failures = 0
+        self.total_calls = 0
+        self.total_failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def key(self) -> Tuple[str, str, str]:
+        return self.base_url, self.model, self.key_name
+
+    @property
+    def name(self) -> str:
+        return f"{self.model} @ {urlparse(self.base_url).netloc or self.base_url}"
+
+    def p90(self) -> Optional[float]:
+        if len(self.latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        return self.cooldown_until <= (now if now is not None else time.monotonic())
+
+    def record_success(self, latency: float):
+        self.total_calls += 1
+        self.latencies.append(latency)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def record_failure(self):
+        self.total_calls += 1
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.FAILURE_THRESHOLD:
+            # 15s, 30s, 60s, ... capped at 5 minutes
+            backoff = 15 * 2 ** (self.consecutive_failures - self.FAILURE_THRESHOLD)
+            self.cooldown_until = time.monotonic() + min(backoff, 300)
+
+
+class ProviderPool:
+    """Ordered fallback chain of providers with optional hedged requests."""
+
+    DEFAULT_HEDGE_DELAY = 4.0  # seconds, used until a provider has enough latency samples
+
+    def __init__(self, log: Optional[logging.Logger] = None):
+        self.log = log or logging.getLogger("red.offtopic.providers")
+        self.providers: List[Provider] = []
+
+    def configure(self, entries: List[dict], api_tokens: Dict[str, str]):
+        """Rebuild the chain from config, keeping health data of unchanged providers."""
+        previous = {p.key: p for p in self.providers}
+        providers = []
+        for entry in entries:
+            provider = Provider(entry["base_url"], entry["model"], entry.get("key_name") or "openai_api_key")
+            provider = previous.get(provider.key, provider)
+            api_key = api_tokens.get(provider.key_name)
+            if not api_key:
+                self.log.warning(f"No API key '{provider.key_name}' for provider {provider.name}, skipping")
+                continue
+            if provider.client is None or provider.client.api_key != api_key:
+                provider.client = AsyncOpenAI(api_key=api_key, base_url=provider.base_url)
+            providers.append(provider)
+        self.providers = providers
+
+    def ordered(self) -> List[Provider]:
+        """Healthy providers in configured order, cooling-down ones as a last resort."""
+        now = time.monotonic()
+        healthy = [p for p in self.providers if p.is_healthy(now)]
+        return healthy + [p for p in self.providers if not p.is_healthy(now)]
+
+    async def _attempt(self, provider: Provider, call: Callable[[Provider], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            provider.record_failure()
+            raise
+        provider.record_success(time.monotonic() - started)
+        return result
+
+    async def run(self, call: Callable[[Provider], Awaitable[T]], hedge: bool = False) -> T:
+        """Run call against the chain until one provider succeeds.
+
+        Failures fall through to the next provider. In hedged mode, a backup request is started
+        when the running one hasn't answered within its p90 latency; the first success wins and
+        the other request is cancelled.
+        """
+        candidates = self.ordered()
+        if not candidates:
+            raise LookupError("no LLM provider configured")
+
+        running: Dict[asyncio.Task, Provider] = {}
+        errors: List[Exception] = []
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            provider = candidates[next_index]
+            next_index += 1
+            running[asyncio.create_task(self._attempt(provider, call))] = provider
+
+        launch()
+        try:
+            while running:
+                timeout = None
+                if hedge and len(running) == 1 and next_index < len(candidates):
+                    current = next(iter(running.values()))
+                    timeout = current.p90() or self.DEFAULT_HEDGE_DELAY
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.log.debug(f"Hedging: {current.name} slower than {timeout:.1f}s, starting backup")
+                    launch()
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    self.log.warning(f"Provider {provider.name} failed: {error}")
+                    errors.append(error)
+
+                if not running and next_index < len(candidates):
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+
+        raise errors[-1]
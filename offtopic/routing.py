@@ -0,0 +1,240 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import collections
+import json
+import math
+import re
+import time
+
+from .prefilter import tokenize
+
+
+# response_format for endpoints that support structured outputs
+ROUTING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "offtopic_routing",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "segments": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "segment": {"type": "integer"},
+                            "channel_id": {"type": ["string", "null"]},
+                            "reason": {"type": "string"},
+                        },
+                        "required": ["segment", "channel_id", "reason"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["segments"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class ChannelProfile:
+    """Term counts describing what a channel is about, and when they were collected."""
+
+    NAME_WEIGHT = 5  # name and topic terms count like this many messages
+
+    def __init__(self, channel_id: int, terms: Dict[str, int], built_at: float):
+        self.channel_id = channel_id
+        self.terms = terms
+        self.built_at = built_at
+
+    @classmethod
+    def build(cls, channel_id: int, name: str, topic: Optional[str], texts: Iterable[str]) -> "ChannelProfile":
+        terms: Dict[str, int] = collections.Counter()
+        for term in tokenize(re.sub(r"[-_]", " ", name) + " " + (topic or "")):
+            terms[term] += cls.NAME_WEIGHT
+        for text in texts:
+            terms.update(set(tokenize(text)))
+        return cls(channel_id, dict(terms), time.monotonic())
+
+
+class ChannelRouter:
+    """Scores text against every profiled channel at once through an inverted index.
+
+    Channel vectors are log-scaled term counts weighted by how few channels use a term, normalised
+    to unit length, so a score is the cosine similarity between a text and a channel. Scoring only
+    touches the postings of the text's own terms, whatever the number of channels.
+    """
+
+    PROFILE_TTL = 3600  # seconds before a channel profile is rebuilt
+
+    def __init__(self):
+        self.profiles: Dict[int, ChannelProfile] = {}
+        self._index: Optional[Dict[str, List[Tuple[int, float]]]] = None
+
+    def stale(self, channel_ids: Iterable[int]) -> List[int]:
+        """Channels without a profile or with an expired one."""
+        cutoff = time.monotonic() - self.PROFILE_TTL
+        return [cid for cid in channel_ids if cid not in self.profiles or self.profiles[cid].built_at < cutoff]
+
+    def update(self, profile: ChannelProfile):
+        self.profiles[profile.channel_id] = profile
+        self._index = None
+
+    def drop(self, channel_id: int):
+        if self.profiles.pop(channel_id, None) is not None:
+            self._index = None
+
+    def retain(self, channel_ids: Iterable[int]):
+        """Forget profiles of channels that are no longer candidates."""
+        keep = set(channel_ids)
+        for channel_id in [cid for cid in self.profiles if cid not in keep]:
+            self.drop(channel_id)
+
+    def _get_index(self) -> Dict[str, List[Tuple[int, float]]]:
+        if self._index is None:
+            channel_count = len(self.profiles)
+            df = collections.Counter(term for profile in self.profiles.values() for term in profile.terms)
+            index: Dict[str, List[Tuple[int, float]]] = collections.defaultdict(list)
+            for profile in self.profiles.values():
+                weights = {
+                    term: (1 + math.log(count)) * math.log(1 + channel_count / df[term])
+                    for term, count in profile.terms.items()
+                }
+                norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+                for term, weight in weights.items():
+                    index[term].append((profile.channel_id, weight / norm))
+            self._index = dict(index)
+        return self._index
+
+    def score(self, texts: Iterable[str]) -> Dict[int, float]:
+        """Cosine similarity of the combined texts to each channel that shares a term with them."""
+        counts = collections.Counter(term for text in texts for term in tokenize(text))
+        if not counts:
+            return {}
+        index = self._get_index()
+        scores: Dict[int, float] = collections.defaultdict(float)
+        norm = 0.0
+        for term, count in counts.items():
+            weight = 1 + math.log(count)
+            norm += weight * weight
+            for channel_id, channel_weight in index.get(term, ()):
+                scores[channel_id] += weight * channel_weight
+        norm = math.sqrt(norm)
+        return {channel_id: score / norm for channel_id, score in scores.items()}
+
+
+class RouteSegment:
+    """A run of consecutive messages that best fits the same channel."""
+
+    DECISIVE_SCORE = 0.2  # best score needed to skip the LLM
+    DECISIVE_MARGIN = 1.5  # ... and how far it has to be ahead of the runner-up
+
+    def __init__(self, start: int, end: int, channel_id: Optional[int], score: float, runner_up: float):
+        self.start = start
+        self.end = end
+        self.channel_id = channel_id
+        self.score = score
+        self.runner_up = runner_up
+
+    @property
+    def decisive(self) -> bool:
+        return (
+            self.channel_id is not None
+            and self.score >= self.DECISIVE_SCORE
+            and self.score >= self.DECISIVE_MARGIN * self.runner_up
+        )
+
+
+def segment_window(
+    router: ChannelRouter, texts: List[str], min_score: float = 0.05, smooth: int = 1, min_run: int = 2
+) -> List[RouteSegment]:
+    """Split a chronological window into runs of messages that fit the same channel.
+
+    Each message is labelled with the best channel for itself plus ``smooth`` neighbours on either
+    side; messages too short to judge follow their predecessor. Runs shorter than ``min_run`` are
+    absorbed by the run before them, then every run is scored as a whole.
+    """
+    if not texts:
+        return []
+
+    per_message = [router.score([text]) for text in texts]
+    labels: List[Optional[int]] = []
+    for index in range(len(texts)):
+        combined: Dict[int, float] = collections.Counter()
+        for neighbour in per_message[max(0, index - smooth):index + smooth + 1]:
+            combined.update(neighbour)
+        best = max(combined.items(), key=lambda kv: kv[1], default=None)
+        labels.append(best[0] if best and best[1] >= min_score else None)
+
+    # Unjudgeable messages follow the previous label; leading ones take the first real label
+    first_label = next((label for label in labels if label is not None), None)
+    previous = first_label
+    for index, label in enumerate(labels):
+        if label is None:
+            labels[index] = previous
+        else:
+            previous = label
+
+    runs: List[List] = []  # [channel_id, start, end]
+    for index, label in enumerate(labels):
+        if runs and runs[-1][0] == label:
+            runs[-1][2] = index + 1
+        else:
+            runs.append([label, index, index + 1])
+
+    merged: List[List] = []
+    for run in runs:
+        if merged and (run[2] - run[1] < min_run or merged[-1][0] == run[0]):
+            merged[-1][2] = run[2]
+        else:
+            merged.append(run)
+    if len(merged) > 1 and merged[0][2] - merged[0][1] < min_run:
+        merged[1][1] = merged[0][1]
+        del merged[0]
+
+    segments = []
+    for _, start, end in merged:
+        ranked = sorted(router.score(texts[start:end]).items(), key=lambda kv: kv[1], reverse=True)
+        channel_id, score = ranked[0] if ranked else (None, 0.0)
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        segments.append(RouteSegment(start, end, channel_id, score, runner_up))
+    return segments
+
+
+def parse_routes(text: str) -> Dict[int, Tuple[Optional[str], str]]:
+    """Parse a routing answer into {segment number: (channel ID or None, reason)}.
+
+    Tolerates markdown fences and surrounding prose; entries that don't validate are skipped.
+    """
+    content = text.strip()
+    if "```" in content:
+        content = content.split("```")[1].split("```")[0].strip()
+        if content.startswith("json"):
+            content = content[4:]
+
+    start, end = content.find("{"), content.rfind("}")
+    if not 0 <= start < end:
+        raise ValueError("no JSON object in routing response")
+    try:
+        obj = json.loads(content[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid routing JSON: {e}")
+    if not isinstance(obj, dict) or not isinstance(obj.get("segments"), list):
+        raise ValueError("routing response has no segments")
+
+    routes: Dict[int, Tuple[Optional[str], str]] = {}
+    for entry in obj["segments"]:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            number = int(entry.get("segment"))
+        except (TypeError, ValueError):
+            continue
+        channel_id = entry.get("channel_id")
+        channel_id = str(channel_id).strip() if channel_id not in (None, "", "null") else None
+        if channel_id is not None and not channel_id.isdigit():
+            continue
+        reason = entry.get("reason") or ""
+        routes[number] = (channel_id, reason if isinstance(reason, str) else str(reason))
+    return routes
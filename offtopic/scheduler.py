@@ -0,0 +1,125 @@
+from typing import Awaitable, Callable, Deque, Dict, Optional
+import asyncio
+import collections
+import contextlib
+import logging
+
+
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class _Waiter:
+    __slots__ = ("future", "on_position", "reported")
+
+    def __init__(self, future: asyncio.Future, on_position: Optional[PositionCallback]):
+        self.future = future
+        self.on_position = on_position
+        self.reported = 0
+
+
+class FairScheduler:
+    """Caps concurrent jobs globally and per guild.
+
+    Jobs that can't start right away wait in a FIFO per guild; free slots are handed out
+    round-robin across guilds, so one busy guild can't starve the others. Waiters are told
+    their position whenever it changes.
+    """
+
+    def __init__(self, name: str, global_limit: int, guild_limit: int, log: Optional[logging.Logger] = None):
+        self.name = name
+        self.global_limit = global_limit
+        self.guild_limit = guild_limit
+        self.log = log or logging.getLogger("red.offtopic.scheduler")
+        self._running_total = 0
+        self._running: Dict[int, int] = {}
+        self._queues: "collections.OrderedDict[int, Deque[_Waiter]]" = collections.OrderedDict()
+        self._callbacks: set = set()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _has_capacity(self, guild_id: int) -> bool:
+        return self._running_total < self.global_limit and self._running.get(guild_id, 0) < self.guild_limit
+
+    def _start(self, guild_id: int):
+        self._running_total += 1
+        self._running[guild_id] = self._running.get(guild_id, 0) + 1
+
+    def _release(self, guild_id: int):
+        self._running_total -= 1
+        self._running[guild_id] -= 1
+        if not self._running[guild_id]:
+            del self._running[guild_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Admit waiters round-robin across guilds while capacity is left."""
+        progressed = True
+        while progressed and self._running_total < self.global_limit:
+            progressed = False
+            for guild_id in list(self._queues):
+                queue = self._queues[guild_id]
+                if not self._has_capacity(guild_id):
+                    continue
+                waiter = queue.popleft()
+                if not queue:
+                    del self._queues[guild_id]
+                else:
+                    self._queues.move_to_end(guild_id)
+                self._start(guild_id)
+                waiter.future.set_result(None)
+                progressed = True
+                break
+        self._report_positions()
+
+    def _positions(self) -> Dict[_Waiter, int]:
+        """Simulate round-robin admission order to get each waiter's 1-based position."""
+        positions = {}
+        queues = [list(q) for q in self._queues.values()]
+        position = 0
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            for queue in queues:
+                if depth < len(queue):
+                    position += 1
+                    positions[queue[depth]] = position
+            depth += 1
+        return positions
+
+    def _report_positions(self):
+        for waiter, position in self._positions().items():
+            if waiter.on_position and waiter.reported != position:
+                waiter.reported = position
+                task = asyncio.create_task(waiter.on_position(position))
+                self._callbacks.add(task)
+                task.add_done_callback(self._callbacks.discard)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, guild_id: int, on_position: Optional[PositionCallback] = None):
+        """Hold a slot for the duration of the block, waiting in line if necessary."""
+        if self._has_capacity(guild_id) and guild_id not in self._queues:
+            self._start(guild_id)
+        else:
+            waiter = _Waiter(asyncio.get_running_loop().create_future(), on_position)
+            self._queues.setdefault(guild_id, collections.deque()).append(waiter)
+            self.log.debug(f"{self.name}: guild {guild_id} queued ({self.waiting} waiting)")
+            self._report_positions()
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    # Admitted just before being cancelled: hand the slot back
+                    self._release(guild_id)
+                else:
+                    queue = self._queues.get(guild_id)
+                    if queue and waiter in queue:
+                        queue.remove(waiter)
+                        if not queue:
+                            del self._queues[guild_id]
+                    self._report_positions()
+                raise
+        try:
+            yield
+        finally:
+            self._release(guild_id)
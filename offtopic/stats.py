@@ -0,0 +1,62 @@
+from typing import Dict, List, Optional, Sequence
+import time
+
+
+MAX_ENTRIES = 1000  # rolling per-guild call log
+
+OUTCOMES = ("ontopic", "flagged", "parse_fail", "error", "cancelled", "cached", "prefiltered", "routed")
+
+# Compact log entry: [unix_ts, model, prompt_tokens, completion_tokens, latency_ms, outcome]
+TS, MODEL, PROMPT, COMPLETION, LATENCY, OUTCOME = range(6)
+
+
+def make_entry(model: str, outcome: str, prompt_tokens: int, completion_tokens: int, latency: float) -> list:
+    return [int(time.time()), model, prompt_tokens, completion_tokens, int(latency * 1000), outcome]
+
+
+def add_entry(usage: dict, entry: list):
+    """Append to the rolling log and update the all-time totals in place."""
+    log = usage.setdefault("log", [])
+    log.append(entry)
+    if len(log) > MAX_ENTRIES:
+        del log[: len(log) - MAX_ENTRIES]
+
+    totals = usage.setdefault("totals", {})
+    totals["calls"] = totals.get("calls", 0) + 1
+    totals["prompt_tokens"] = totals.get("prompt_tokens", 0) + entry[PROMPT]
+    totals["completion_tokens"] = totals.get("completion_tokens", 0) + entry[COMPLETION]
+    outcomes = totals.setdefault("outcomes", {})
+    outcomes[entry[OUTCOME]] = outcomes.get(entry[OUTCOME], 0) + 1
+
+
+def percentile(values: Sequence[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, None for an empty sequence."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+
+def summarize(entries: List[list], since: Optional[float] = None) -> Dict[str, dict]:
+    """Per-model call counts, token sums and latency percentiles over LLM calls in the log."""
+    per_model: Dict[str, dict] = {}
+    for entry in entries:
+        if since and entry[TS] < since:
+            continue
+        # No LLM call was made for these
+        if entry[OUTCOME] in ("cached", "prefiltered"):
+            continue
+        stats = per_model.setdefault(entry[MODEL], {"calls": 0, "prompt": 0, "completion": 0, "latencies": [], "outcomes": {}})
+        stats["calls"] += 1
+        stats["prompt"] += entry[PROMPT]
+        stats["completion"] += entry[COMPLETION]
+        stats["latencies"].append(entry[LATENCY])
+        stats["outcomes"][entry[OUTCOME]] = stats["outcomes"].get(entry[OUTCOME], 0) + 1
+
+    for stats in per_model.values():
+        latencies = stats.pop("latencies")
+        stats["p50"] = percentile(latencies, 50)
+        stats["p90"] = percentile(latencies, 90)
+        stats["p99"] = percentile(latencies, 99)
+    return per_model
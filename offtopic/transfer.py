@@ -0,0 +1,386 @@
+import discord
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import collections
+import logging
+import re
+
+import aiohttp
+
+
+MAX_CONTENT = 2000
+MAX_FILES = 10
+MAX_EMBEDS = 10
+MERGE_WINDOW = timedelta(minutes=5)
+BULK_DELETE = 100  # messages per bulk delete request
+
+# Called with (moved, deleted, total) whenever a stage makes progress; must not block
+ProgressCallback = Callable[[int, int, int], None]
+
+
+class TransferResult:
+    """Outcome of a webhook transfer."""
+
+    def __init__(self):
+        self.moved: List[discord.Message] = []
+        self.skipped: List[discord.Message] = []
+        self.deleted: List[discord.Message] = []
+        self.jump_url: str = ""
+        self.error: Optional[str] = None
+
+
+class ProgressReporter:
+    """Coalesces frequent progress updates into at most one render call per interval.
+
+    ``update`` never blocks the caller; the latest values are rendered by a background task.
+    """
+
+    def __init__(self, render: Callable[..., Awaitable[None]], interval: float = 2.0):
+        self.render = render
+        self.interval = interval
+        self._values: Optional[tuple] = None
+        self._last = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+
+    def update(self, *values):
+        self._values = values
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        while self._values is not None:
+            delay = self._last + self.interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            values, self._values = self._values, None
+            self._last = loop.time()
+            await self.render(*values)
+
+    async def close(self):
+        """Drop pending updates, so nothing overwrites the caller's final message."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class _Batch:
+    """Consecutive messages by one author that are re-posted together."""
+
+    __slots__ = ("author", "messages", "parts", "attachments", "embeds", "size")
+
+    def __init__(self, author):
+        self.author = author
+        self.messages: List[discord.Message] = []
+        self.parts: List[str] = []
+        self.attachments: List[discord.Attachment] = []
+        self.embeds: List[discord.Embed] = []
+        self.size = 0
+
+
+class _RateLimiter:
+    """Sliding-window pacer so we stay below the webhook execute limit."""
+
+    def __init__(self, rate: int = 5, per: float = 2.0):
+        self.rate = rate
+        self.per = per
+        self._stamps = collections.deque()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self._stamps and now - self._stamps[0] >= self.per:
+                self._stamps.popleft()
+            if len(self._stamps) < self.rate:
+                self._stamps.append(now)
+                return
+            await asyncio.sleep(self.per - (now - self._stamps[0]))
+
+
+class WebhookTransfer:
+    """Re-posts messages into another channel through a cached webhook per destination."""
+
+    WEBHOOK_NAME = "OffTopic"
+    PREFETCH = 3  # batches whose attachments are downloaded ahead of the sender
+
+    def __init__(self, bot, log: Optional[logging.Logger] = None):
+        self.bot = bot
+        self.log = log or logging.getLogger("red.offtopic.transfer")
+        self._webhooks: Dict[int, discord.Webhook] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._limiters: Dict[int, _RateLimiter] = {}
+
+    def forget(self, channel_id: int):
+        """Drop the cached webhook for a channel (e.g. after it was deleted)."""
+        self._webhooks.pop(channel_id, None)
+
+    def clear(self):
+        """Drop all cached webhooks."""
+        self._webhooks.clear()
+        self._limiters.clear()
+
+    async def get_webhook(self, channel: discord.TextChannel) -> discord.Webhook:
+        """Get the cached webhook for a channel, reusing or creating one on Discord if needed."""
+        webhook = self._webhooks.get(channel.id)
+        if webhook:
+            return webhook
+
+        lock = self._locks.setdefault(channel.id, asyncio.Lock())
+        async with lock:
+            webhook = self._webhooks.get(channel.id)
+            if webhook:
+                return webhook
+            for hook in await channel.webhooks():
+                if (
+                    hook.token
+                    and hook.name == self.WEBHOOK_NAME
+                    and hook.user
+                    and hook.user.id == self.bot.user.id
+                ):
+                    webhook = hook
+                    break
+            else:
+                webhook = await channel.create_webhook(name=self.WEBHOOK_NAME, reason="Off-Topic Transfer")
+                self.log.info(f"Created transfer webhook in #{channel.name} ({channel.id})")
+            self._webhooks[channel.id] = webhook
+            return webhook
+
+    async def transfer(
+        self,
+        messages: List[discord.Message],
+        destination: discord.TextChannel,
+        progress: Optional[ProgressCallback] = None,
+        delete_originals: bool = False
+    ) -> TransferResult:
+        """Re-post messages (oldest first) into destination as their original authors.
+
+        With ``delete_originals``, messages are bulk-deleted from their channel as soon as their
+        batch has been sent, overlapping with the sends still to come.
+        """
+        result = TransferResult()
+        batches, result.skipped = self._build_batches(messages, destination.guild.filesize_limit)
+        total = len(messages) - len(result.skipped)
+
+        def report():
+            if progress:
+                progress(len(result.moved), len(result.deleted), total)
+
+        # Attachments for upcoming batches are downloaded while the current one is sent
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.PREFETCH)
+        producer = asyncio.create_task(self._produce(batches, queue))
+
+        # Sent messages are deleted while later batches are still going out
+        deletions: Optional[asyncio.Queue] = None
+        deleter = None
+        if delete_originals and batches:
+            deletions = asyncio.Queue()
+            deleter = asyncio.create_task(self._delete(messages[0].channel, deletions, result, report))
+
+        try:
+            while True:
+                item = await self._next_item(queue, producer)
+                if item is None:
+                    break
+                batch, payloads = item
+                if not payloads:
+                    # Nothing we could re-post, so the originals stay where they are
+                    result.skipped.extend(batch.messages)
+                    continue
+
+                try:
+                    first = await self._send_batch(destination, batch, payloads)
+                except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.log.error(f"Webhook send to #{destination.name} failed: {e}")
+                    result.error = str(e)
+                    break
+
+                if first and not result.jump_url:
+                    result.jump_url = first.jump_url
+                result.moved.extend(batch.messages)
+                if deletions:
+                    deletions.put_nowait(batch.messages)
+                report()
+        finally:
+            producer.cancel()
+            if deleter:
+                # Whatever made it to the destination still has to go from the source
+                deletions.put_nowait(None)
+                await deleter
+
+        return result
+
+    @staticmethod
+    async def _next_item(queue: asyncio.Queue, producer: asyncio.Task):
+        """Next prepared batch, or None once the producer is done; re-raises if the producer crashed."""
+        getter = asyncio.ensure_future(queue.get())
+        done, _ = await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        # The producer has stopped; hand out what it left behind before reporting how it ended
+        if not queue.empty():
+            return queue.get_nowait()
+        producer.result()
+        return None
+
+    async def _delete(
+        self, channel: discord.TextChannel, queue: asyncio.Queue,
+        result: TransferResult, report: Callable[[], None]
+    ):
+        """Delete sent messages, bundling everything that piled up into bulk requests."""
+        finished = False
+        while not finished:
+            item = await queue.get()
+            if item is None:
+                break
+            pending = list(item)
+            while len(pending) < BULK_DELETE and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                pending.extend(item)
+
+            for start in range(0, len(pending), BULK_DELETE):
+                chunk = pending[start:start + BULK_DELETE]
+                await self._delete_chunk(channel, chunk)
+                result.deleted.extend(chunk)
+                report()
+
+    async def _delete_chunk(self, channel: discord.TextChannel, messages: List[discord.Message]):
+        try:
+            await channel.delete_messages(messages)
+        except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # e.g. one of them is already gone; fall back to single deletes
+            self.log.debug(f"Bulk delete of {len(messages)} message(s) in #{channel.name} failed: {e}")
+            for msg in messages:
+                try:
+                    await msg.delete()
+                except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+
+    def _build_batches(
+        self, messages: List[discord.Message], filesize_limit: int
+    ) -> Tuple[List[_Batch], List[discord.Message]]:
+        """Group consecutive messages by the same author into as few webhook sends as possible."""
+        batches: List[_Batch] = []
+        skipped: List[discord.Message] = []
+        current: Optional[_Batch] = None
+        last_created = None
+
+        for msg in messages:
+            # Attachments we can't re-upload would be lost on delete, so keep those messages
+            if any(a.size > filesize_limit for a in msg.attachments):
+                skipped.append(msg)
+                continue
+
+            content = msg.content
+            if msg.stickers:
+                stickers = " ".join(f"[Sticker: {s.name}]" for s in msg.stickers)
+                content = f"{content}\n{stickers}" if content else stickers
+            embeds = [e for e in msg.embeds if e.type == "rich"]
+            size = sum(a.size for a in msg.attachments)
+
+            # Forwards, polls etc. have nothing a webhook can re-post; deleting them would lose them
+            if not content and not msg.attachments and not embeds:
+                skipped.append(msg)
+                continue
+
+            mergeable = (
+                current is not None
+                and current.author.id == msg.author.id
+                and msg.created_at - last_created <= MERGE_WINDOW
+                and len("\n".join(current.parts + [content])) <= MAX_CONTENT
+                and len(current.attachments) + len(msg.attachments) <= MAX_FILES
+                and len(current.embeds) + len(embeds) <= MAX_EMBEDS
+                and current.size + size <= filesize_limit
+            )
+            if not mergeable:
+                current = _Batch(msg.author)
+                batches.append(current)
+
+            current.messages.append(msg)
+            if content:
+                current.parts.append(content)
+            current.attachments.extend(msg.attachments)
+            current.embeds.extend(embeds)
+            current.size += size
+            last_created = msg.created_at
+
+        return batches, skipped
+
+    async def _produce(self, batches: List[_Batch], queue: asyncio.Queue):
+        """Download attachments and build payloads ahead of the sender."""
+        try:
+            for batch in batches:
+                try:
+                    payloads = await self._build_payloads(batch)
+                except Exception as e:
+                    # CDN downloads can also fail with aiohttp/timeout errors that discord.py doesn't wrap
+                    self.log.warning(f"Could not download attachments of {len(batch.messages)} message(s): {e}")
+                    payloads = None
+                await queue.put((batch, payloads))
+        finally:
+            # The sender also watches this task, so a full queue here doesn't leave it waiting
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    async def _build_payloads(self, batch: _Batch) -> List[dict]:
+        """Build the webhook send kwargs for a batch (content split at 2000 chars)."""
+        files = await asyncio.gather(*(a.to_file(spoiler=a.is_spoiler()) for a in batch.attachments))
+        content = "\n".join(batch.parts)
+        chunks = [content[i:i + MAX_CONTENT] for i in range(0, len(content), MAX_CONTENT)] or [""]
+
+        common = {
+            "username": _webhook_username(batch.author),
+            "avatar_url": batch.author.display_avatar.url,
+            "allowed_mentions": discord.AllowedMentions.none(),
+        }
+        payloads = [dict(common, content=chunk) for chunk in chunks]
+        # Files and embeds go with the last chunk so they follow the text
+        if files:
+            payloads[-1]["files"] = list(files)
+        if batch.embeds:
+            payloads[-1]["embeds"] = batch.embeds
+        return [p for p in payloads if p["content"] or p.get("files") or p.get("embeds")]
+
+    async def _send_batch(
+        self, destination: discord.TextChannel, batch: _Batch, payloads: List[dict]
+    ) -> Optional[discord.WebhookMessage]:
+        """Send a batch's payloads, recreating the webhook once if it was deleted."""
+        limiter = self._limiters.setdefault(destination.id, _RateLimiter())
+        first = None
+        index = 0
+        for attempt in range(2):
+            webhook = await self.get_webhook(destination)
+            try:
+                while index < len(payloads):
+                    await limiter.wait()
+                    sent = await webhook.send(wait=True, **payloads[index])
+                    first = first or sent
+                    index += 1
+                return first
+            except discord.NotFound:
+                if attempt:
+                    raise
+                self.log.info(f"Transfer webhook in #{destination.name} vanished, recreating")
+                self.forget(destination.id)
+                # Files are consumed by a send attempt, so rebuild the remaining payloads
+                payloads = await self._build_payloads(batch)
+        return first
+
+
+_FORBIDDEN_NAME = re.compile(r"(discord|clyde)", re.IGNORECASE)
+
+
+def _webhook_username(author: discord.abc.User) -> str:
+    """Webhook usernames must be 1-80 chars and may not contain 'discord' or 'clyde'."""
+    name = _FORBIDDEN_NAME.sub(lambda m: m.group(0)[:-1] + "\u200b" + m.group(0)[-1], author.display_name)
+    return name[:80] or "Unbekannt"
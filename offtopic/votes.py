@@ -0,0 +1,64 @@
+from typing import Dict, Set
+import asyncio
+import time
+
+
+THUMBS_UP = "\N{THUMBS UP SIGN}"
+THUMBS_DOWN = "\N{THUMBS DOWN SIGN}"
+
+
+class PendingVote:
+    """Live tally of one vote, fed by reaction events instead of polling the message.
+
+    ``record`` is the persisted form (channel, first message, destination, deadline, ...),
+    so a vote can be rebuilt after a reload without re-running the analysis.
+    """
+
+    def __init__(self, message_id: int, guild_id: int, record: dict):
+        self.message_id = message_id
+        self.guild_id = guild_id
+        self.record = record
+        self.voters: Dict[str, Set[int]] = {THUMBS_UP: set(), THUMBS_DOWN: set()}
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def threshold(self) -> int:
+        return self.record["threshold"]
+
+    @property
+    def deadline(self) -> float:
+        return self.record["deadline"]
+
+    def add(self, emoji: str, user_id: int):
+        voters = self.voters.get(emoji)
+        if voters is None:
+            return
+        voters.add(user_id)
+        if len(voters) >= self.threshold:
+            self.resolve("approve" if emoji == THUMBS_UP else "reject")
+
+    def remove(self, emoji: str, user_id: int):
+        voters = self.voters.get(emoji)
+        if voters is not None:
+            voters.discard(user_id)
+
+    def resolve(self, result: str):
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def cancel(self):
+        """Stop waiting without deciding, e.g. on cog unload (the vote stays persisted)."""
+        if not self.future.done():
+            self.future.cancel()
+
+    async def wait(self) -> str:
+        """Wait for the outcome: 'approve', 'reject', 'timeout' or 'unloaded'."""
+        remaining = max(0.0, self.deadline - time.time())
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.future), remaining)
+        except asyncio.TimeoutError:
+            return "timeout"
+        except asyncio.CancelledError:
+            if self.future.cancelled():
+                return "unloaded"
+            raise
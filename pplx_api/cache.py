@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional, Tuple
+import collections
+import hashlib
+import time
+
+
+class CachedAnswer:
+    """A finished answer with everything needed to send it again."""
+
+    def __init__(self, content: str, search_results: List[Dict[str, str]], upload_url: Optional[str] = None):
+        self.content = content
+        self.search_results = search_results
+        self.upload_url = upload_url
+
+
+def normalise(text: str) -> str:
+    """Case, whitespace and trailing punctuation don't make a different question."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+class AnswerCache:
+    """TTL'd, size-bounded cache of answers keyed by model and normalised prompt messages."""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, Tuple[float, CachedAnswer]]" = collections.OrderedDict()
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, str]]) -> str:
+        digest = hashlib.sha256(model.encode("utf-8"))
+        for message in messages:
+            digest.update(b"\0")
+            digest.update(f"{message['role']}:{normalise(message['content'])}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, answer = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def put(self, key: str, answer: CachedAnswer):
+        self._entries[key] = (time.monotonic() + self.ttl, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
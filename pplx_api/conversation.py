@@ -0,0 +1,85 @@
+from typing import Dict, Iterable, List, Optional
+import collections
+import re
+
+
+_THINK_BLOCK = re.compile(r"<think>.*?</think>\s*", re.DOTALL)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class Exchange:
+    """One question and the bot's answer to it, linked to the answer it followed up on."""
+
+    def __init__(self, question: str, answer: str, parent: Optional[int] = None):
+        self.question = question
+        self.answer = _THINK_BLOCK.sub("", answer).strip()
+        self.parent = parent  # message id of the previous answer in the thread
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.question) + estimate_tokens(self.answer)
+
+
+class ConversationMemory:
+    """Bounded LRU of recent exchanges, keyed by the ids of the bot messages holding each answer.
+
+    Replying to any of those messages continues the conversation: the earlier turns are rebuilt
+    by following the parent links, newest first, until ``token_budget`` is used up. Threads
+    whose older answers have been evicted simply start there.
+    """
+
+    def __init__(self, max_entries: int = 1000, token_budget: int = 3000):
+        self.max_entries = max_entries
+        self.token_budget = token_budget
+        self._exchanges: "collections.OrderedDict[int, Exchange]" = collections.OrderedDict()
+
+    def remember(self, message_ids: Iterable[int], question: str, answer: str, parent: Optional[int] = None):
+        exchange = Exchange(question, answer, parent)
+        for message_id in message_ids:
+            self._exchanges[message_id] = exchange
+            self._exchanges.move_to_end(message_id)
+        while len(self._exchanges) > self.max_entries:
+            self._exchanges.popitem(last=False)
+
+    def __contains__(self, message_id: int) -> bool:
+        return message_id in self._exchanges
+
+    def history(self, message_id: int) -> List[Dict[str, str]]:
+        """Alternating user/assistant messages leading up to (and including) this answer."""
+        turns = []
+        budget = self.token_budget
+        seen = set()
+        exchange = self._exchanges.get(message_id)
+        if exchange is not None:
+            self._exchanges.move_to_end(message_id)
+        while exchange is not None and id(exchange) not in seen:
+            seen.add(id(exchange))
+            if exchange.tokens > budget:
+                if not turns:
+                    # Always keep the answer being replied to, cut down to the budget
+                    turns.append(self._truncated(exchange, budget))
+                break
+            turns.append(exchange)
+            budget -= exchange.tokens
+            exchange = self._exchanges.get(exchange.parent) if exchange.parent is not None else None
+
+        messages = []
+        for turn in reversed(turns):
+            messages.append({"role": "user", "content": turn.question})
+            messages.append({"role": "assistant", "content": turn.answer})
+        return messages
+
+    @staticmethod
+    def _truncated(exchange: Exchange, budget: int) -> Exchange:
+        question = exchange.question[:budget * 2]
+        room = max(0, budget * 4 - len(question))
+        truncated = Exchange(question, "")
+        truncated.answer = exchange.answer[:room]
+        return truncated
+
+    def clear(self):
+        self._exchanges.clear()
@@ -0,0 +1,153 @@
+from typing import List
+import re
+
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+_CELL_SPLIT = re.compile(r"\s*\|\s*")
+_WRAP_AT = re.compile(r"\s+\S*$")
+
+
+class AnswerFormatter:
+    """Turns raw model output into Discord-ready chunks in one pass over its lines.
+
+    Text can be fed as it streams in. Each completed line goes through three stages at once:
+    ``<think>`` content is diverted into ``reasoning``, markdown tables outside code blocks are
+    turned into lists, and the result is packed into chunks of at most ``limit`` characters.
+    A chunk that ends inside a code block is closed with a fence, and the next chunk reopens it.
+    """
+
+    def __init__(self, limit: int = 1950):
+        self.limit = limit
+        self.chunks: List[str] = []
+        self.reasoning: List[str] = []
+        self._current: List[str] = []
+        self._length = 0
+        self._partial = ""
+        self._held = ""  # visible text before a <think> on the same line
+        self._in_think = False
+        self._in_table = False
+        self._in_code = False
+        self._started = False
+
+    # ---- input ----
+
+    def feed(self, text: str) -> bool:
+        """Add raw text. Returns True if at least one line was completed."""
+        data = self._partial + text
+        if "\n" not in data:
+            self._partial = data
+            return False
+        *lines, self._partial = data.split("\n")
+        for line in lines:
+            self._think_stage(line)
+        return True
+
+    def finish(self) -> List[str]:
+        """Flush the last line and return all chunks (an unfinished <think> block stays hidden)."""
+        if self._partial:
+            self._think_stage(self._partial)
+            self._partial = ""
+        if self._in_table:
+            self._in_table = False
+        if self._current:
+            self.chunks.append(self._render_current())
+            self._current = []
+            self._length = 0
+        return [chunk for chunk in self.chunks if chunk.strip()]
+
+    def preview(self) -> List[str]:
+        """Chunks for the text so far, for progressive display (completed lines only)."""
+        if not self._current:
+            return list(self.chunks)
+        return self.chunks + [self._render_current()]
+
+    @property
+    def reasoning_text(self) -> str:
+        return "\n".join(self.reasoning).strip()
+
+    # ---- stages ----
+
+    def _think_stage(self, line: str):
+        while True:
+            if self._in_think:
+                end = line.find(THINK_CLOSE)
+                if end == -1:
+                    self.reasoning.append(line)
+                    return
+                self.reasoning.append(line[:end])
+                line = self._held + line[end + len(THINK_CLOSE):]
+                self._held = ""
+                self._in_think = False
+                continue
+            start = line.find(THINK_OPEN)
+            if start == -1:
+                self._table_stage(line)
+                return
+            self._held = line[:start]
+            self._in_think = True
+            line = line[start + len(THINK_OPEN):]
+
+    def _table_stage(self, line: str):
+        stripped = line.strip()
+        if not self._in_code and "|" in line and not stripped.startswith("```"):
+            # Header separator rows carry no content
+            if "---" in line:
+                return
+            cells = [cell for cell in _CELL_SPLIT.split(stripped) if cell]
+            if not cells:
+                return
+            if not self._in_table:
+                self._in_table = True
+                self._chunk_stage(f"**{cells[0]}:**")
+            elif len(cells) >= 2:
+                self._chunk_stage(f"• **{cells[0]}**: {' → '.join(cells[1:])}")
+            return
+
+        if self._in_table:
+            self._in_table = False
+            self._chunk_stage("")
+        self._chunk_stage(line)
+
+    def _chunk_stage(self, line: str):
+        # Skip blank lines before the first visible text (e.g. left over from a think block)
+        if not self._started:
+            if not line.strip():
+                return
+            self._started = True
+
+        was_in_code = self._in_code
+        if line.strip().startswith("```"):
+            self._in_code = not self._in_code
+
+        for piece in self._wrap(line):
+            if self._current and self._length + len(piece) + 1 > self.limit:
+                chunk = "\n".join(self._current)
+                if was_in_code:
+                    self.chunks.append(chunk + "\n```")
+                    self._current = ["```"]
+                    self._length = 4
+                else:
+                    self.chunks.append(chunk)
+                    self._current = []
+                    self._length = 0
+            self._current.append(piece)
+            self._length += len(piece) + 1
+
+    def _wrap(self, line: str) -> List[str]:
+        """Hard-wrap a line that wouldn't fit into any chunk, preferring whitespace."""
+        room = self.limit - 8  # leave space for code fences
+        pieces = []
+        while len(line) > room:
+            cut = room
+            match = _WRAP_AT.search(line, 0, room)
+            if match and match.start() > room // 2:
+                cut = match.start()
+            pieces.append(line[:cut])
+            line = line[cut:].lstrip()
+        pieces.append(line)
+        return pieces
+
+    def _render_current(self) -> str:
+        chunk = "\n".join(self._current)
+        return chunk + "\n```" if self._in_code else chunk
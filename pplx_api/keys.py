@@ -0,0 +1,128 @@
+from typing import Dict, Iterable, Optional
+import collections
+import time
+
+
+class KeyState:
+    """Rolling health of one API key."""
+
+    WINDOW = 20  # recent calls the error rate is computed over
+
+    def __init__(self, key: str):
+        self.key = key
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.total_calls = 0
+        self.results = collections.deque(maxlen=self.WINDOW)  # True = failed
+
+    @property
+    def error_rate(self) -> float:
+        return sum(self.results) / len(self.results) if self.results else 0.0
+
+    @property
+    def masked(self) -> str:
+        return f"{self.key[:8]}..."
+
+    def cooling_down(self, now: Optional[float] = None) -> bool:
+        return self.cooldown_until > (now if now is not None else time.monotonic())
+
+
+class KeyPool:
+    """Picks the healthiest API key per request instead of always starting with the first.
+
+    Keys are ranked by requests in flight plus a penalty for their recent error rate, least
+    recently used first on ties, so concurrent requests spread over all keys. Rate-limited keys
+    sit out their Retry-After window; rejected keys (401/403) sit out longer.
+    """
+
+    ERROR_PENALTY = 4  # an always-failing key ranks like one with 4 requests in flight
+    DEFAULT_RETRY_AFTER = 60.0  # seconds, for 429s without a Retry-After header
+    AUTH_COOLDOWN = 600.0
+
+    def __init__(self):
+        self._states: Dict[str, KeyState] = {}
+
+    def sync(self, keys: Iterable[str]):
+        """Match the pool to the configured keys, keeping the health of unchanged ones."""
+        keys = [key for key in keys if key]
+        self._states = {key: self._states.get(key) or KeyState(key) for key in keys}
+
+    @property
+    def states(self):
+        return list(self._states.values())
+
+    def pick(self, exclude: Iterable[str] = ()) -> Optional[KeyState]:
+        """The best usable key, or None if every key is excluded or cooling down."""
+        now = time.monotonic()
+        exclude = set(exclude)
+        candidates = [s for s in self._states.values() if s.key not in exclude and not s.cooling_down(now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda s: (s.in_flight + self.ERROR_PENALTY * s.error_rate, s.last_used))
+
+    def acquire(self, state: KeyState):
+        state.in_flight += 1
+        state.total_calls += 1
+        state.last_used = time.monotonic()
+
+    def release(self, state: KeyState):
+        state.in_flight = max(0, state.in_flight - 1)
+
+    def record_success(self, state: KeyState):
+        state.results.append(False)
+
+    def record_failure(self, state: KeyState, cooldown: float = 0.0):
+        state.results.append(True)
+        if cooldown:
+            state.cooldown_until = max(state.cooldown_until, time.monotonic() + cooldown)
+
+    def track(self, state: KeyState, stream) -> "TrackedStream":
+        """Keep the key in flight until this streaming response ends or is closed."""
+        return TrackedStream(self, state, stream)
+
+
+class TrackedStream:
+    """A streaming response that records its key's health once it ends.
+
+    The consumer must ``aclose()`` it, so the key is released even if it stops early or never
+    started iterating; an abandoned stream says nothing about the key's health.
+    """
+
+    def __init__(self, pool: KeyPool, state: KeyState, stream):
+        self._pool = pool
+        self._state = state
+        self._stream = stream
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._finish(failed=False)
+            raise
+        except Exception:
+            self._finish(failed=True)
+            raise
+
+    def _finish(self, failed: bool):
+        if self._done:
+            return
+        self._done = True
+        self._pool.release(self._state)
+        if failed:
+            self._pool.record_failure(self._state)
+        else:
+            self._pool.record_success(self._state)
+
+    async def aclose(self):
+        if self._done:
+            return
+        self._done = True
+        self._pool.release(self._state)
+        close = getattr(self._stream, "close", None)
+        if close is not None:
+            await close()
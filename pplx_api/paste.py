@@ -0,0 +1,40 @@
+from typing import Callable
+import abc
+import asyncio
+
+import aiohttp
+
+
+class PasteBackend(abc.ABC):
+    """Somewhere to upload long text (the reasoning) to, returning a public URL."""
+
+    @abc.abstractmethod
+    async def upload(self, text: str, filename: str = "thinking.txt") -> str:
+        """Upload the text and return its URL; raises on failure."""
+
+
+class ZeroXZeroPaste(PasteBackend):
+    """0x0-compatible paste service (x0.at, 0x0.st or a self-hosted/local instance).
+
+    The file is POSTed as multipart form field ``file``; the response body is the URL.
+    """
+
+    def __init__(self, get_session: Callable[[], aiohttp.ClientSession], url: str = "https://x0.at", timeout: float = 30):
+        self._get_session = get_session
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def upload(self, text: str, filename: str = "thinking.txt") -> str:
+        data = aiohttp.FormData()
+        data.add_field('file', text, filename=filename)
+        data.add_field('secret', '')
+
+        try:
+            async with self._get_session().post(self.url, data=data, timeout=self.timeout) as response:
+                if response.status == 200:
+                    return (await response.text()).strip()
+                raise Exception(f"Upload failed: HTTP {response.status}")
+        except asyncio.TimeoutError:
+            raise Exception(f"Upload timeout after {self.timeout.total:.0f} seconds")
+        except aiohttp.ClientError as e:
+            raise Exception(f"Upload error: {str(e)}")
@@ -1,15 +1,25 @@
 import discord
 from discord import Message, ui, ButtonStyle
 from redbot.core import Config, checks, commands
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Mapping, Optional, Tuple
 import openai
 from openai import AsyncOpenAI
 import asyncio
 import re
 import aiohttp
 import logging
+import secrets
+import time
 from datetime import datetime
 
+from .cache import AnswerCache, CachedAnswer
+from .conversation import ConversationMemory
+from .formatting import AnswerFormatter
+from .keys import KeyPool
+from .paste import PasteBackend, ZeroXZeroPaste
+from .scheduler import FairScheduler, QueueFull, Ticket
+from .streaming import StreamingReply
+
 
 class PerplexityAI(commands.Cog):
     """Send messages to Perplexity AI"""
@@ -21,64 +31,227 @@ class PerplexityAI(commands.Cog):
             "model": "sonar-reasoning-pro",
             "max_tokens": 8000,
             "prompt": "",
+            "stream": True,
+            "paste_url": "https://x0.at",
+            "max_concurrent": 3,
+            "per_user_requests": 2,
+            "max_queued": 20,
+            "jobs": {},
         }
         self.config.register_global(**default_global)
         self.log = logging.getLogger("red.pplx_api")
+        # Snapshot of the global settings and API keys so requests never wait on the config driver
+        self._settings: Dict[str, Any] = {}  # filled in cog_load
+        self._api_keys: Dict[str, str] = {}
         self._clients = {}  # Cache clients by API key
+        self._key_pool = KeyPool()
+        self._answer_cache = AnswerCache()
+        self._conversations = ConversationMemory()
         self._upload_tasks = set()  # Track upload tasks for cleanup
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.paste: PasteBackend = ZeroXZeroPaste(self._get_session)
+        self._scheduler = FairScheduler()
+        self._jobs: Dict[str, asyncio.Task] = {}  # Background deep-research jobs by id
+        self._unloading = False
+
+    async def cog_load(self):
+        """Load the settings snapshot, open the shared HTTP session and set up the paste backend and request queue"""
+        self._settings = await self.config.all()
+        del self._settings["jobs"]  # jobs are read and written through config directly
+        self._api_keys = dict(await self.perplexity_api_keys())
+        self._get_session()
+        self.paste = ZeroXZeroPaste(self._get_session, self._settings["paste_url"])
+        self._scheduler.configure(
+            self._settings["max_concurrent"], self._settings["per_user_requests"], self._settings["max_queued"]
+        )
+        self._track_task(self._resume_jobs())
 
-    def cog_unload(self):
+    async def cog_unload(self):
         """Cleanup when cog is unloaded"""
+        # Jobs stay in config and are resumed on the next load
+        self._unloading = True
+        for task in self._jobs.values():
+            task.cancel()
         # Cancel any running upload tasks
         for task in self._upload_tasks:
             if not task.done():
                 task.cancel()
         # Clear client cache
         self._clients.clear()
+        self._answer_cache.clear()
+        self._conversations.clear()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Long-lived session: pooled keep-alive connections and cached DNS across uploads"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def red_delete_data_for_user(self, *, requester, user_id: int):
+        """Drop the user's pending deep-research jobs"""
+        async with self.config.jobs() as jobs:
+            for job_id, job in list(jobs.items()):
+                if job["user_id"] == user_id:
+                    del jobs[job_id]
+                    if task := self._jobs.get(job_id):
+                        task.cancel()
 
     async def perplexity_api_keys(self):
         return await self.bot.get_shared_api_tokens("perplexity")
 
+    @commands.Cog.listener()
+    async def on_red_api_tokens_update(self, service_name: str, api_tokens: Mapping[str, str]):
+        """Keep the API key snapshot in sync with `[p]set api perplexity`"""
+        if service_name == "perplexity":
+            self._api_keys = dict(api_tokens)
+            self._key_pool.sync(self._api_keys.values())
+
+    async def _update_setting(self, key: str, value):
+        """Save a global setting and update the in-memory snapshot"""
+        await self.config.get_attr(key).set(value)
+        self._settings[key] = value
+
     async def upload_to_0x0(self, text: str) -> str:
-        """Upload text to 0x0.at file sharing service"""
-        url = "https://x0.at"
-        data = aiohttp.FormData()
-        data.add_field('file', text, filename='thinking.txt')
-        data.add_field('secret', '')
-        
-        timeout = aiohttp.ClientTimeout(total=30)
-        try:
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(url, data=data) as response:
-                    if response.status == 200:
-                        return (await response.text()).strip()
-                    else:
-                        raise Exception(f"Upload failed: HTTP {response.status}")
-        except asyncio.TimeoutError:
-            raise Exception("Upload timeout after 30 seconds")
-        except Exception as e:
-            raise Exception(f"Upload error: {str(e)}")
+        """Upload text to the configured paste service (x0.at by default)"""
+        return await self.paste.upload(text, filename='thinking.txt')
 
     @commands.command(aliases=['pplx'])
     async def perplexity(self, ctx: commands.Context, *, message: str = ""):
-        """Send a message to Perplexity AI, combining referenced message and additional text."""
-        question = await self._get_question(ctx, message)
+        """Send a message to Perplexity AI, combining referenced message and additional text.
+
+        Replying to one of my answers with a question continues that conversation.
+        Repeated questions are answered from a cache; add `--fresh` for new web results.
+        """
+        message, fresh = self._pop_fresh_flag(message)
+        parent = self._follow_up_of(ctx, message)
+        question = message if parent else await self._get_question(ctx, message)
         if not question:
             await ctx.send("❓ Please provide a question either as text or by replying to a message.")
             return
 
-        await self.do_perplexity(ctx, question)
+        await self.do_perplexity(ctx, question, fresh=fresh, parent=parent)
 
     @commands.command(aliases=['pplxdeep'])
     async def perplexitydeep(self, ctx: commands.Context, *, message: str = ""):
-        """Send a message to Perplexity AI using the sonar-deep-research model for more thorough responses."""
-        question = await self._get_question(ctx, message)
+        """Send a message to Perplexity AI using the sonar-deep-research model for more thorough responses.
+
+        Deep research takes minutes, so it runs as a background job and the answer is posted as a reply.
+        Repeated questions are answered from a cache; add `--fresh` for new web results.
+        """
+        message, fresh = self._pop_fresh_flag(message)
+        parent = self._follow_up_of(ctx, message)
+        question = message if parent else await self._get_question(ctx, message)
         if not question:
             await ctx.send("Please provide a question either as text or by replying to a message.")
             return
 
-        await self.do_perplexity(ctx, question, model="sonar-deep-research")
+        # Take a place in line first, so a rejected job is never saved or acknowledged
+        ticket = await self._submit_request(ctx)
+        if ticket is None:
+            return
+
+        job_id = secrets.token_hex(3)
+        while job_id in self._jobs:
+            job_id = secrets.token_hex(3)
+        job = {
+            "channel_id": ctx.channel.id,
+            "message_id": ctx.message.id,
+            "user_id": ctx.author.id,
+            "question": question,
+            "model": "sonar-deep-research",
+            "fresh": fresh,
+            "parent": parent,
+        }
+        try:
+            async with self.config.jobs() as jobs:
+                jobs[job_id] = job
+        except BaseException:
+            self._scheduler.release(ticket)
+            raise
+        self._start_job(job_id, ctx, job, ticket)
+
+        prefix = ctx.prefix if ctx.prefix else "[p]"
+        status = "started" if ticket.started else f"queued (#{self._scheduler.position(ticket)} in line)"
+        await ctx.send(
+            f"🔬 Deep research {status} as job `{job_id}` - I'll reply here when it's done. "
+            f"Cancel it with `{prefix}pplxcancel {job_id}`."
+        )
+
+    @commands.command(aliases=['pplxcancel'])
+    async def perplexitycancel(self, ctx: commands.Context, job_id: str):
+        """Cancel one of your running deep-research jobs."""
+        job = (await self.config.jobs()).get(job_id)
+        if not job:
+            await ctx.send(f"❌ There is no running job `{job_id}`.")
+            return
+        if job["user_id"] != ctx.author.id and not await self.bot.is_owner(ctx.author):
+            await ctx.send("❌ You can only cancel your own jobs.")
+            return
+
+        async with self.config.jobs() as jobs:
+            jobs.pop(job_id, None)
+        if task := self._jobs.get(job_id):
+            task.cancel()
+        await ctx.send(f"🛑 Job `{job_id}` cancelled.")
 
+    def _start_job(self, job_id: str, ctx: commands.Context, job: dict, ticket: Optional[Ticket] = None):
+        task = asyncio.create_task(self._run_job(job_id, ctx, job, ticket))
+        self._jobs[job_id] = task
+        task.add_done_callback(lambda _: self._jobs.pop(job_id, None))
+
+    async def _run_job(self, job_id: str, ctx: commands.Context, job: dict, ticket: Optional[Ticket] = None):
+        """Answer a deep-research job without holding up the command, replying when done"""
+        try:
+            await self._answer(
+                ctx, job["question"], model=job["model"], fresh=job["fresh"], parent=job.get("parent"),
+                background=True, ticket=ticket
+            )
+        except Exception as e:
+            self.log.error(f"Job {job_id} failed: {e}")
+        finally:
+            if ticket:
+                # Also covers answers that returned before using the reserved slot
+                self._scheduler.release(ticket)
+            if not self._unloading:
+                async with self.config.jobs() as jobs:
+                    jobs.pop(job_id, None)
+
+    async def _resume_jobs(self):
+        """Restart jobs that were still running when the cog was unloaded"""
+        await self.bot.wait_until_red_ready()
+        for job_id, job in (await self.config.jobs()).items():
+            channel = self.bot.get_channel(job["channel_id"])
+            message = None
+            if channel is not None:
+                try:
+                    message = await channel.fetch_message(job["message_id"])
+                except discord.HTTPException:
+                    pass
+            if message is None:
+                # The command message is gone, so there is nothing to reply to
+                self.log.info(f"Dropping job {job_id}: its command message is gone")
+                async with self.config.jobs() as jobs:
+                    jobs.pop(job_id, None)
+                continue
+
+            self.log.info(f"Resuming job {job_id}")
+            self._start_job(job_id, await self.bot.get_context(message), job)
+
+    @staticmethod
+    def _pop_fresh_flag(message: str) -> Tuple[str, bool]:
+        """Remove a --fresh flag (bypass the answer cache) from the command text."""
+        message, count = re.subn(r'(?:^|\s)--fresh(?=\s|$)', ' ', message)
+        return message.strip(), bool(count)
+
+    def _follow_up_of(self, ctx: commands.Context, message: str) -> Optional[int]:
+        """The answer this command continues: a reply with new text to an answer still in memory"""
+        ref = ctx.message.reference
+        if message and ref and ref.message_id in self._conversations:
+            return ref.message_id
+        return None
 
     async def _get_question(self, ctx: commands.Context, message: str = "") -> str:
         """Extract question from reference and additional text."""
@@ -117,74 +290,213 @@ class PerplexityAI(commands.Cog):
 
         return question
 
-    async def do_perplexity(self, ctx: commands.Context, message: str, model: str = None):
+    async def do_perplexity(
+        self, ctx: commands.Context, message: str, model: str = None, fresh: bool = False, parent: Optional[int] = None
+    ):
         async with ctx.typing():
-            # Validate API keys
-            api_keys = (await self.perplexity_api_keys()).values()
-            if not any(api_keys):
-                prefix = ctx.prefix if ctx.prefix else "[p]"
-                return await ctx.send(f"API keys missing! Use `{prefix}set api perplexity api_key,<YOUR_KEY>` or add multiple keys: `{prefix}set api perplexity api_key,<YOUR_KEY> api_key_2,<YOUR_KEY_2>`")
+            await self._answer(ctx, message, model=model, fresh=fresh, parent=parent)
+
+    async def _answer(
+        self, ctx: commands.Context, message: str, model: str = None, fresh: bool = False,
+        parent: Optional[int] = None, background: bool = False, ticket: Optional[Ticket] = None
+    ):
+        """Answer a question, following up on the answer ``parent`` if given.
+
+        ``background`` jobs aren't streamed and post the answer as a reply. A ``ticket`` reserved
+        by the caller is used instead of queueing again; the caller releases it if this returns early.
+        """
+        reply_to = ctx.message if background else None
+
+        # Validate API keys
+        api_keys = self._api_keys.values()
+        if not any(api_keys):
+            prefix = ctx.prefix if ctx.prefix else "[p]"
+            return await ctx.send(f"API keys missing! Use `{prefix}set api perplexity api_key,<YOUR_KEY>` or add multiple keys: `{prefix}set api perplexity api_key,<YOUR_KEY> api_key_2,<YOUR_KEY_2>`")
+
+        # Get configuration
+        model, max_tokens = self._get_model_config(model)
+        messages = self._prepare_messages(message, parent)
+
+        # Serve repeated questions from the cache
+        cache_key = AnswerCache.key(model, messages)
+        cached = None if fresh else self._answer_cache.get(cache_key)
+        if cached:
+            self.log.debug(f"Answer cache hit ({cache_key[:12]})")
+            sent = await self._send_answer(ctx, cached, cached=True, reply_to=reply_to)
+            self._remember(sent, message, cached, parent)
+            return
 
-            # Get configuration
-            model, max_tokens = await self._get_model_config(model)
-            messages = await self._prepare_messages(message)
+        # Wait for a free slot; cached answers above don't need one
+        if ticket is None:
+            ticket = await self._queue_request(ctx)
+            if ticket is None:
+                return
+        else:
+            await ticket.wait()
 
-            # Call API
-            try:
+        # Call API
+        try:
+            if self._settings["stream"] and not background:
+                stream = await self.call_api_stream(model, api_keys, messages, max_tokens)
+                if not stream:
+                    return await ctx.send("❌ No response from API - all keys may be invalid or rate limited")
+                answer, sent = await self._stream_and_send_response(ctx, stream)
+            else:
                 response = await self.call_api(model, api_keys, messages, max_tokens)
                 if not response:
                     return await ctx.send("❌ No response from API - all keys may be invalid or rate limited")
 
                 # Process response
-                await self._process_and_send_response(ctx, response)
-            except Exception as e:
-                self.log.error(f"Error in do_perplexity: {e}")
-                await ctx.send(f"❌ An error occurred: {str(e)}")
+                answer, sent = await self._process_and_send_response(ctx, response, reply_to=reply_to)
 
-    async def _process_and_send_response(self, ctx: commands.Context, response):
-        """Process API response and send to Discord"""
+            if answer:
+                self._answer_cache.put(cache_key, answer)
+                self._remember(sent, message, answer, parent)
+        except Exception as e:
+            self.log.error(f"Error in do_perplexity: {e}")
+            await ctx.send(f"❌ An error occurred: {str(e)}")
+        finally:
+            self._scheduler.release(ticket)
+
+    async def _queue_request(self, ctx: commands.Context) -> Optional[Ticket]:
+        """Get a slot from the scheduler, showing the queue position while waiting; None if rejected"""
+        ticket = await self._submit_request(ctx)
+        if ticket is None or ticket.started:
+            return ticket
+
+        notice = None
+        try:
+            position = self._scheduler.position(ticket)
+            notice = await ctx.send(f"⏳ You're #{position} in the queue - your request starts as soon as a slot is free.")
+            await ticket.wait()
+        except BaseException:
+            self._scheduler.release(ticket)
+            raise
+        finally:
+            if notice:
+                try:
+                    await notice.delete()
+                except discord.HTTPException:
+                    pass
+        return ticket
+
+    async def _submit_request(self, ctx: commands.Context) -> Optional[Ticket]:
+        """Start or queue a request without waiting for it; None (and a notice) if rejected"""
+        try:
+            return self._scheduler.submit(ctx.guild.id if ctx.guild else None, ctx.author.id)
+        except QueueFull as e:
+            await ctx.send(f"❌ {e}")
+            return None
+
+    async def _process_and_send_response(
+        self, ctx: commands.Context, response, reply_to: Optional[discord.Message] = None
+    ) -> Tuple[Optional[CachedAnswer], List[discord.Message]]:
+        """Process API response and send to Discord; returns the answer and the messages holding it"""
         try:
             content = response.choices[0].message.content
             if not content:
                 await ctx.send("❌ Received empty response from API")
-                return
+                return None, []
                 
             search_results = self._extract_search_results(response)
-
-            # Handle reasoning content
-            upload_url = await self._handle_reasoning_content(content)
-            if upload_url:
-                content = re.sub(r'<think>.*?</think>', '', content, flags=re.DOTALL)
-            
-            # Remove markdown tables (Discord doesn't display them properly)
-            content = self._convert_tables_to_lists(content)
-
-            # Split and send content
-            chunks = self.smart_split(content)
-            if not chunks:
-                await ctx.send("❌ No content to send after processing")
-                return
-                
-            for index, chunk in enumerate(chunks):
-                view = None
-                if index == len(chunks) - 1 and upload_url:
-                    view = self.create_view(upload_url, ctx.guild)
-                await ctx.send(chunk, view=view)
-                await ctx.typing()
-                await asyncio.sleep(0.5)
-
-            # Send citations as embed
-            citation_lines = self._format_search_results(search_results)
-            if citation_lines:
-                embed = discord.Embed(
-                    title="📚 Quellen",
-                    description="\n".join(citation_lines),
-                    color=await ctx.embed_color()
-                )
-                await ctx.send(embed=embed)
+            answer = CachedAnswer(content, search_results)
+            sent = await self._send_answer(ctx, answer, upload_reasoning=True, reply_to=reply_to)
+            return (answer, sent) if sent else (None, [])
         except Exception as e:
             self.log.error(f"Error processing response: {e}")
             await ctx.send(f"❌ Error processing response: {str(e)}")
+            return None, []
+
+    async def _send_answer(
+        self, ctx: commands.Context, answer: CachedAnswer, cached: bool = False, upload_reasoning: bool = False,
+        reply_to: Optional[discord.Message] = None
+    ) -> List[discord.Message]:
+        """Send a finished answer with its citations; the reasoning button follows once it is uploaded.
+
+        With ``reply_to`` the first message replies to it (and pings its author).
+        Returns the messages holding the answer, empty if there was nothing to send.
+        """
+        formatter = AnswerFormatter()
+        formatter.feed(answer.content)
+        if cached:
+            formatter.feed("\n-# 📦 Cached answer - add `--fresh` for new results")
+        chunks = formatter.finish()
+        if not chunks:
+            await ctx.send("❌ No content to send after processing")
+            return []
+
+        # Reasoning is uploaded while the answer is being sent
+        upload = self._start_reasoning_upload(formatter.reasoning_text) if upload_reasoning else None
+
+        # discord.py waits out rate limits itself, so chunks go out back to back
+        sent = []
+        for index, chunk in enumerate(chunks):
+            view = None
+            if index == len(chunks) - 1 and answer.upload_url:
+                view = self.create_view(answer.upload_url, ctx.guild)
+            reply = {"reference": reply_to, "mention_author": True} if index == 0 and reply_to else {}
+            sent.append(await ctx.send(chunk, view=view, **reply))
+
+        if upload:
+            self._attach_reasoning(sent[-1], upload, answer)
+        await self._send_citations(ctx, answer.search_results)
+        return sent
+
+    async def _stream_and_send_response(self, ctx: commands.Context, stream) -> Tuple[Optional[CachedAnswer], List[discord.Message]]:
+        """Show a streamed answer as it arrives, then finish it like a normal response"""
+        reply = StreamingReply(ctx, log=self.log)
+
+        # Each delta is formatted once; the display only changes when a line is complete
+        formatter = AnswerFormatter()
+        parts = []
+        search_results = []
+        try:
+            await reply.start()
+            async for chunk in stream:
+                search_results = self._extract_search_results(chunk) or search_results
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                parts.append(delta)
+                if formatter.feed(delta):
+                    reply.update(formatter.preview())
+        except Exception as e:
+            self.log.error(f"Stream interrupted: {e}")
+            await reply.fail(f"❌ Stream interrupted: {str(e)}")
+            return None, []
+        finally:
+            # Frees the key's slot right away, also when we are cancelled (e.g. a cancelled job)
+            await stream.aclose()
+
+        if not parts:
+            await reply.fail("❌ Received empty response from API")
+            return None, []
+
+        chunks = formatter.finish()
+        if not chunks:
+            await reply.fail("❌ No content to send after processing")
+            return None, []
+
+        upload = self._start_reasoning_upload(formatter.reasoning_text)
+        await reply.finish(chunks)
+        answer = CachedAnswer("".join(parts), search_results)
+        if upload:
+            self._attach_reasoning(reply.messages[-1], upload, answer)
+        await self._send_citations(ctx, search_results)
+        return answer, list(reply.messages)
+
+    async def _send_citations(self, ctx: commands.Context, search_results: List[Dict[str, str]]):
+        """Send citations as embed"""
+        citation_lines = self._format_search_results(search_results)
+        if citation_lines:
+            embed = discord.Embed(
+                title="📚 Quellen",
+                description="\n".join(citation_lines),
+                color=await ctx.embed_color()
+            )
+            await ctx.send(embed=embed)
 
     def create_view(self, upload_url, guild):
         """Helper to create a view with the reasoning button."""
@@ -251,143 +563,117 @@ class PerplexityAI(commands.Cog):
         
         return formatted
 
-    def _convert_tables_to_lists(self, content: str) -> str:
-        """Convert markdown tables to Discord-friendly lists"""
-        lines = content.split('\n')
-        result_lines = []
-        in_table = False
-        
-        for line in lines:
-            # Detect table rows (contain | but not at start/end only)
-            if '|' in line and not line.strip().startswith('```'):
-                # Skip header separator lines (contain --- and |)
-                if '---' in line and '|' in line:
-                    continue
-                    
-                # Extract table data
-                cells = [cell.strip() for cell in line.split('|')]
-                # Remove empty cells from start/end
-                cells = [cell for cell in cells if cell]
-                
-                if cells:  # Only process non-empty rows
-                    if not in_table:
-                        in_table = True
-                        # First row becomes header
-                        result_lines.append(f"**{cells[0]}:**")
-                    else:
-                        # Data rows become bullet points
-                        if len(cells) >= 2:
-                            row_content = f"**{cells[0]}**: {' → '.join(cells[1:])}"
-                            result_lines.append(f"• {row_content}")
-                
-            else:
-                if in_table:
-                    # End of table, add spacing
-                    result_lines.append('')
-                    in_table = False
-                result_lines.append(line)
-        
-        return '\n'.join(result_lines)
-
-    async def _handle_reasoning_content(self, content: str) -> Optional[str]:
-        """Extract and upload reasoning content, return URL if successful"""
-        think_match = re.search(r'<think>(.*?)</think>', content, re.DOTALL)
-        if not think_match:
-            return None
-        
-        think_text = think_match.group(1)
-        try:
-            task = asyncio.create_task(self.upload_to_0x0(think_text))
-            self._upload_tasks.add(task)
-            upload_url = await task
-            self._upload_tasks.discard(task)
-            return upload_url
-        except Exception as e:
-            self.log.warning(f"Failed to upload reasoning: {e}")
+    def _start_reasoning_upload(self, reasoning: str) -> Optional[asyncio.Task]:
+        """Start uploading the reasoning in the background, if there is any"""
+        if not reasoning:
             return None
+        return self._track_task(self.upload_to_0x0(reasoning))
+
+    def _attach_reasoning(self, message: discord.Message, upload: asyncio.Task, answer: CachedAnswer):
+        """Add the Reasoning button to the last answer message once the upload has finished"""
+        async def attach():
+            try:
+                upload_url = await upload
+            except Exception as e:
+                self.log.warning(f"Failed to upload reasoning: {e}")
+                return
+            answer.upload_url = upload_url
+            try:
+                await message.edit(view=self.create_view(upload_url, message.guild))
+            except discord.HTTPException as e:
+                self.log.warning(f"Failed to attach reasoning button: {e}")
+
+        self._track_task(attach())
+
+    def _track_task(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._upload_tasks.add(task)
+        task.add_done_callback(self._upload_tasks.discard)
+        return task
 
-    async def _prepare_messages(self, message: str) -> List[Dict[str, str]]:
-        """Prepare messages array with optional system prompt"""
+    def _remember(self, sent: List[discord.Message], question: str, answer: CachedAnswer, parent: Optional[int]):
+        """Keep the exchange so replies to any of its messages can continue the conversation"""
+        if sent:
+            self._conversations.remember((message.id for message in sent), question, answer.content, parent)
+
+    def _prepare_messages(self, message: str, parent: Optional[int] = None) -> List[Dict[str, str]]:
+        """Prepare messages array with optional system prompt and the earlier turns of the conversation"""
         messages = [{"role": "user", "content": message}]
-        if prompt := await self.config.prompt():
+        if parent is not None:
+            messages[:0] = self._conversations.history(parent)
+        if prompt := self._settings["prompt"]:
             messages.insert(0, {"role": "system", "content": prompt})
         return messages
 
-    async def _get_model_config(self, override_model: Optional[str] = None) -> tuple[str, int]:
+    def _get_model_config(self, override_model: Optional[str] = None) -> tuple[str, int]:
         """Get model and max_tokens configuration"""
         if override_model:
             model = override_model
         else:
-            model = await self.config.model()
-        max_tokens = await self.config.max_tokens() or 8000
+            model = self._settings["model"]
+        max_tokens = self._settings["max_tokens"] or 8000
         return model, max_tokens
 
     async def call_api(self, model: str, api_keys: list, messages: List[dict], max_tokens: int):
-        for key in filter(None, api_keys):
+        return await self._create_completion(
+            api_keys, model=model, messages=messages, max_tokens=max_tokens,
+            web_search_options={"search_context_size": "high"}
+        )
+
+    async def call_api_stream(self, model: str, api_keys: list, messages: List[dict], max_tokens: int):
+        """Open a streaming completion; the key stays in flight until the stream ends or is aclose()d"""
+        return await self._create_completion(
+            api_keys, stream=True, model=model, messages=messages, max_tokens=max_tokens,
+            web_search_options={"search_context_size": "high"}
+        )
+
+    async def _create_completion(self, api_keys, stream: bool = False, **request):
+        """Send a request with the healthiest key, moving on to the next one on failure"""
+        self._key_pool.sync(api_keys)
+        tried = []
+        while (state := self._key_pool.pick(exclude=tried)) is not None:
+            tried.append(state.key)
+            self._key_pool.acquire(state)
             try:
-                client = self._get_or_create_client(key)
-                response = await client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    web_search_options={"search_context_size": "high"}
-                )
-                return response
+                client = self._get_or_create_client(state.key)
+                response = await client.chat.completions.create(stream=stream, **request)
+            except (openai.BadRequestError, asyncio.CancelledError):
+                # The request itself is invalid (or a job was cancelled), another key won't help
+                self._key_pool.release(state)
+                raise
             except Exception as e:
-                self.log.error(f"API Error with key {key[:8]}...: {str(e)}")
-        self.log.error("All API keys failed")
+                self._key_pool.release(state)
+                self._key_pool.record_failure(state, self._cooldown_for(e))
+                self.log.error(f"API Error with key {state.masked}: {str(e)}")
+                continue
+
+            if stream:
+                return self._key_pool.track(state, response)
+            self._key_pool.release(state)
+            self._key_pool.record_success(state)
+            return response
+
+        self.log.error("All API keys failed" if tried else "All API keys are rate limited")
         return None
 
-    def smart_split(self, text: str, limit: int = 1950) -> List[str]:
-        chunks = []
-        current_chunk = []
-        current_length = 0
-        in_code_block = False
-
-        lines = text.split('\n')
-        for line in lines:
-            line_stripped = line.strip()
-
-            # Toggle code block state on lines with ```
-            if line_stripped.startswith('```'):
-                in_code_block = not in_code_block
-
-            new_length = current_length + len(line) + 1  # +1 for newline
-
-            if new_length > limit:
-                # Finalize current chunk
-                chunk = '\n'.join(current_chunk)
-
-                # Add code block closure if needed
-                if in_code_block:
-                    chunk += '\n```'
-                    # Next chunk should start with code block opener
-                    chunks.append(chunk)
-                    current_chunk = ['```', line]
-                    current_length = len('```')
-                else:
-                    chunks.append(chunk)
-                    current_chunk = [line]
-                    current_length = len(line) + 1
-            else:
-                current_chunk.append(line)
-                current_length = new_length
-
-        # Add remaining content
-        if current_chunk:
-            chunk = '\n'.join(current_chunk)
-            if in_code_block:
-                chunk += '\n```'
-            chunks.append(chunk)
-
-        return chunks
+    def _cooldown_for(self, error: Exception) -> float:
+        """How long a key sits out after this error"""
+        if isinstance(error, openai.RateLimitError):
+            retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+            try:
+                return float(retry_after)
+            except (TypeError, ValueError):
+                return KeyPool.DEFAULT_RETRY_AFTER
+        if isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+            return KeyPool.AUTH_COOLDOWN
+        return 0.0
 
     @commands.command()
     @checks.is_owner()
     async def setperplexitytokens(self, ctx: commands.Context, tokens: int):
         """Set max tokens (400-8000 range)"""
         clamped_tokens = max(400, min(tokens, 8000))
-        await self.config.max_tokens.set(clamped_tokens)
+        await self._update_setting("max_tokens", clamped_tokens)
         await ctx.send(f"Max tokens set to {clamped_tokens}")
         await ctx.tick()
 
@@ -402,7 +688,7 @@ class PerplexityAI(commands.Cog):
     @checks.is_owner()
     async def setperplexitymodel(self, ctx: commands.Context, model: str):
         """Set the model for Perplexity AI."""
-        await self.config.model.set(model)
+        await self._update_setting("model", model)
         await ctx.send("Perplexity AI model set.")
 
     @commands.command()
@@ -423,5 +709,78 @@ class PerplexityAI(commands.Cog):
     @checks.is_owner()
     async def setperplexityprompt(self, ctx: commands.Context, *, prompt: str):
         """Set the prompt for Perplexity AI."""
-        await self.config.prompt.set(prompt)
+        await self._update_setting("prompt", prompt)
         await ctx.send("Perplexity AI prompt set.")
+
+    @commands.command()
+    @checks.is_owner()
+    async def perplexitykeys(self, ctx: commands.Context):
+        """Show the health of the configured API keys."""
+        self._key_pool.sync(self._api_keys.values())
+        if not self._key_pool.states:
+            await ctx.send("No Perplexity API keys configured.")
+            return
+        now = time.monotonic()
+        lines = []
+        for state in self._key_pool.states:
+            status = f"cooling down {int(state.cooldown_until - now)}s" if state.cooling_down(now) else "ready"
+            lines.append(
+                f"`{state.masked}` {status}, {state.in_flight} in flight, "
+                f"{state.error_rate:.0%} errors (last {len(state.results)}), {state.total_calls} calls"
+            )
+        await ctx.send("\n".join(lines))
+
+    @commands.command()
+    @checks.is_owner()
+    async def getperplexityqueue(self, ctx: commands.Context):
+        """Show the request queue limits and how busy it is."""
+        scheduler = self._scheduler
+        await ctx.send(
+            f"{scheduler.running}/{scheduler.max_concurrent} requests running, "
+            f"{scheduler.waiting}/{scheduler.max_queued} waiting, "
+            f"up to {scheduler.per_user} pending per user"
+        )
+
+    @commands.command()
+    @checks.is_owner()
+    async def setperplexityqueue(self, ctx: commands.Context, concurrent: int, per_user: int, queue_size: int):
+        """Set how many requests run at once, how many one user may have pending, and how many may wait."""
+        concurrent, per_user, queue_size = max(1, concurrent), max(1, per_user), max(0, queue_size)
+        await self._update_setting("max_concurrent", concurrent)
+        await self._update_setting("per_user_requests", per_user)
+        await self._update_setting("max_queued", queue_size)
+        self._scheduler.configure(concurrent, per_user, queue_size)
+        await ctx.send(f"Queue set: {concurrent} at once, {per_user} per user, {queue_size} waiting.")
+
+    @commands.command()
+    @checks.is_owner()
+    async def clearperplexitycache(self, ctx: commands.Context):
+        """Forget all cached answers."""
+        count = len(self._answer_cache)
+        self._answer_cache.clear()
+        await ctx.send(f"Cleared {count} cached answer(s).")
+
+    @commands.command()
+    @checks.is_owner()
+    async def setperplexitypaste(self, ctx: commands.Context, url: str = "https://x0.at"):
+        """Set the 0x0-compatible paste service for reasoning uploads (default: https://x0.at)."""
+        if not url.startswith(("http://", "https://")):
+            await ctx.send("The paste URL must start with http:// or https://")
+            return
+        await self._update_setting("paste_url", url)
+        self.paste = ZeroXZeroPaste(self._get_session, url)
+        await ctx.send(f"Reasoning uploads now go to <{url}>")
+
+    @commands.command()
+    @checks.is_owner()
+    async def getperplexitystream(self, ctx: commands.Context):
+        """Get whether answers are streamed into Discord as they are generated."""
+        stream = await self.config.stream()
+        await ctx.send(f"Perplexity AI streaming is `{'on' if stream else 'off'}`")
+
+    @commands.command()
+    @checks.is_owner()
+    async def setperplexitystream(self, ctx: commands.Context, enabled: bool):
+        """Stream answers into Discord as they are generated (edits a message as text arrives)."""
+        await self._update_setting("stream", enabled)
+        await ctx.send(f"Perplexity AI streaming turned {'on' if enabled else 'off'}.")
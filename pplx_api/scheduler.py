@@ -0,0 +1,128 @@
+from typing import Dict, Hashable, List, Optional
+import asyncio
+import collections
+
+
+class QueueFull(Exception):
+    """The request was rejected; the message is meant for the user."""
+
+
+class Ticket:
+    """One request's place in the scheduler."""
+
+    def __init__(self, guild_id: Optional[Hashable], user_id: int):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.started = False
+        self.done = False
+        self._granted = asyncio.get_running_loop().create_future()
+
+    async def wait(self):
+        """Wait until the request may run."""
+        await asyncio.shield(self._granted)
+
+
+class FairScheduler:
+    """Limits concurrent API requests and decides who goes next.
+
+    At most ``max_concurrent`` requests run at once and each user runs one at a time.
+    A user can have at most ``per_user`` requests running or waiting. Waiting requests
+    are served round-robin across guilds (FIFO within a guild), so one busy server
+    can't starve the others. Once ``max_queued`` requests are waiting, new ones are
+    rejected.
+    """
+
+    def __init__(self, max_concurrent: int = 3, per_user: int = 2, max_queued: int = 20):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.max_queued = max_queued
+        self._queues: "collections.OrderedDict[Hashable, collections.deque]" = collections.OrderedDict()
+        self._running: Dict[int, int] = collections.Counter()  # user id -> running requests
+        self._outstanding: Dict[int, int] = collections.Counter()  # user id -> running + waiting
+        self.running = 0
+
+    def configure(self, max_concurrent: int, per_user: int, max_queued: int):
+        """Apply new limits (e.g. after an owner changed them)."""
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.max_queued = max_queued
+        # A higher limit may let waiting requests start right away
+        self._dispatch()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def submit(self, guild_id: Optional[Hashable], user_id: int) -> Ticket:
+        """Start or queue a request; raises QueueFull if it can't be accepted."""
+        if self._outstanding[user_id] >= self.per_user:
+            raise QueueFull(f"You already have {self._outstanding[user_id]} request(s) pending - please wait for them to finish.")
+        if self.waiting >= self.max_queued:
+            raise QueueFull(f"The queue is full ({self.max_queued} requests waiting) - please try again later.")
+
+        ticket = Ticket(guild_id, user_id)
+        self._outstanding[user_id] += 1
+        self._queues.setdefault(guild_id, collections.deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Give the slot back (or leave the queue); safe to call more than once."""
+        if ticket.done:
+            return
+        ticket.done = True
+        self._outstanding[ticket.user_id] -= 1
+        if ticket.started:
+            self.running -= 1
+            self._running[ticket.user_id] -= 1
+        else:
+            queue = self._queues.get(ticket.guild_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.guild_id]
+            ticket._granted.cancel()
+        self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in line, following the round-robin order (0 once started)."""
+        if ticket.started:
+            return 0
+        for index, queued in enumerate(self._order(), 1):
+            if queued is ticket:
+                return index
+        return 0
+
+    def _order(self) -> List[Ticket]:
+        """Waiting tickets in the order they would be served."""
+        queues = [list(queue) for queue in self._queues.values()]
+        order = []
+        depth = 0
+        while any(depth < len(queue) for queue in queues):
+            order.extend(queue[depth] for queue in queues if depth < len(queue))
+            depth += 1
+        return order
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent:
+            ticket = self._next()
+            if ticket is None:
+                return
+            ticket.started = True
+            self.running += 1
+            self._running[ticket.user_id] += 1
+            ticket._granted.set_result(None)
+
+    def _next(self) -> Optional[Ticket]:
+        # Guilds take turns: the served guild moves to the back of the rotation
+        for guild_id, queue in list(self._queues.items()):
+            ticket = next((t for t in queue if not self._running[t.user_id]), None)
+            if ticket is None:
+                continue
+            queue.remove(ticket)
+            if queue:
+                self._queues.move_to_end(guild_id)
+            else:
+                del self._queues[guild_id]
+            return ticket
+        return None
@@ -0,0 +1,107 @@
+import discord
+from typing import List, Optional
+import asyncio
+import logging
+
+
+class StreamingReply:
+    """Shows a growing answer by editing Discord messages in place.
+
+    The answer is given as a list of chunks (already split to Discord's limit). Each chunk is one
+    message: chunks that changed are edited, new ones are sent, so the text rolls over into new
+    messages as it grows. Updates are throttled to one round of edits per ``interval`` seconds.
+    """
+
+    def __init__(
+        self, channel: discord.abc.Messageable, placeholder: str = "⏳ Thinking...",
+        interval: float = 1.5, log: Optional[logging.Logger] = None
+    ):
+        self.channel = channel
+        self.placeholder = placeholder
+        self.interval = interval
+        self.log = log or logging.getLogger("red.pplx_api.streaming")
+        self.messages: List[discord.Message] = []
+        self._shown: List[str] = []
+        self._pending: Optional[List[str]] = None
+        self._last = float("-inf")
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """Send the placeholder message so the user sees something right away."""
+        message = await self.channel.send(self.placeholder)
+        self.messages.append(message)
+        self._shown.append(self.placeholder)
+
+    def update(self, chunks: List[str]):
+        """Queue the current state of the answer; never blocks the stream reader."""
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        if not chunks:
+            return
+        self._pending = chunks
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush())
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        while self._pending is not None:
+            delay = self._last + self.interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            chunks, self._pending = self._pending, None
+            self._last = loop.time()
+            try:
+                await self._apply(chunks)
+            except discord.HTTPException as e:
+                self.log.warning(f"Progressive edit failed: {e}")
+
+    async def _apply(self, chunks: List[str], view: Optional[discord.ui.View] = None):
+        async with self._lock:
+            for index, chunk in enumerate(chunks):
+                is_last = index == len(chunks) - 1
+                extra = {"view": view} if is_last and view else {}
+                if index < len(self.messages):
+                    if self._shown[index] != chunk or extra:
+                        await self.messages[index].edit(content=chunk, **extra)
+                        self._shown[index] = chunk
+                else:
+                    self.messages.append(await self.channel.send(chunk, **extra))
+                    self._shown.append(chunk)
+
+            # The answer can shrink (e.g. a finished <think> block is dropped); remove leftovers
+            for message in self.messages[len(chunks):]:
+                try:
+                    await message.delete()
+                except discord.HTTPException:
+                    pass
+            del self.messages[len(chunks):]
+            del self._shown[len(chunks):]
+
+    async def finish(self, chunks: List[str], view: Optional[discord.ui.View] = None):
+        """Drop pending updates and show the final answer, with ``view`` on the last message."""
+        self._pending = None
+        if self._task and not self._task.done():
+            if self._lock.locked():
+                # Mid-edit: a cancelled send could still land after we forgot the message, so let it finish
+                await asyncio.shield(self._task)
+            else:
+                # Only waiting out the throttle, nothing to lose
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+        chunks = [chunk for chunk in chunks if chunk.strip()]
+        if chunks:
+            await self._apply(chunks, view)
+
+    async def fail(self, text: str):
+        """Show an error: replaces the placeholder, or follows a partial answer."""
+        await self.finish([])
+        async with self._lock:
+            if self._shown == [self.placeholder]:
+                await self.messages[0].edit(content=text)
+                self._shown[0] = text
+            else:
+                self.messages.append(await self.channel.send(text))
+                self._shown.append(text)